@@ -4,11 +4,12 @@ Complete OCR pipeline with test value extraction and analysis
 """
 
 from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
 from typing import Dict, Any
 import sys
 import os
+import json
 
 # Add the lib directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'lib'))
@@ -29,6 +30,15 @@ app = FastAPI(
 # Initialize OCR processor
 ocr_processor = OCRProcessor() if OCRProcessor else None
 
+ALLOWED_CONTENT_TYPES = [
+    "application/pdf",
+    "image/jpeg",
+    "image/jpg", 
+    "image/png",
+    "image/tiff",
+    "image/bmp"
+]
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -82,19 +92,10 @@ async def analyze_medical_report(file: UploadFile = File(...)):
         )
     
     # Validate file type
-    allowed_types = [
-        "application/pdf",
-        "image/jpeg",
-        "image/jpg", 
-        "image/png",
-        "image/tiff",
-        "image/bmp"
-    ]
-    
-    if file.content_type not in allowed_types:
+    if file.content_type not in ALLOWED_CONTENT_TYPES:
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported file type: {file.content_type}. Supported types: {allowed_types}"
+            detail=f"Unsupported file type: {file.content_type}. Supported types: {ALLOWED_CONTENT_TYPES}"
         )
     
     try:
@@ -132,6 +133,40 @@ async def analyze_medical_report(file: UploadFile = File(...)):
             detail=f"Internal server error: {str(e)}"
         )
 
+@app.post("/analyze-report/stream")
+async def analyze_medical_report_stream(file: UploadFile = File(...)):
+    """
+    Analyze medical test report, streaming results as they are produced
+    
+    Responds with newline-delimited JSON events:
+    1. {"event": "ocr_text", "text": ...} - raw OCR text, as soon as OCR finishes
+    2. {"event": "llava", "text": ...} - fragments of the cleaned text as LLaVA generates them
+    3. {"event": "done", "refined": ..., "cached": ...} - refined is false when LLaVA was unavailable
+    A failure ends the stream with {"event": "error", "detail": ...}.
+    """
+    
+    if not ocr_processor:
+        raise HTTPException(
+            status_code=500,
+            detail="OCR processor not available. Please install required dependencies."
+        )
+    
+    if file.content_type not in ALLOWED_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: {file.content_type}. Supported types: {ALLOWED_CONTENT_TYPES}"
+        )
+    
+    file_content = await file.read()
+    file_type = "pdf" if file.content_type == "application/pdf" else "image"
+    
+    def events():
+        # A plain generator: Starlette iterates it in a worker thread, so OCR and LLaVA don't block the loop
+        for event in ocr_processor.stream_document(file_content, file_type):
+            yield json.dumps(event) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 @app.post("/extract-text-only")
 async def extract_text_only(file: UploadFile = File(...)):
     """
@@ -149,10 +184,7 @@ async def extract_text_only(file: UploadFile = File(...)):
         file_content = await file.read()
         file_type = "pdf" if file.content_type == "application/pdf" else "image"
         
-        if file_type == "pdf":
-            text = ocr_processor.process_pdf(file_content)
-        else:
-            text = ocr_processor.process_image(file_content)
+        text = ocr_processor.extract_text(file_content, file_type)
         
         return {
             "success": True,
@@ -173,6 +205,8 @@ async def health_check():
     return {
         "status": "healthy",
         "ocr_available": ocr_processor is not None,
+        "ocr_cache": ocr_processor.cache.stats() if ocr_processor else None,
+        "ollama": ocr_processor.ollama.stats() if ocr_processor else None,
         "version": "1.0.0"
     }
 
@@ -0,0 +1,63 @@
+"""
+Micro-benchmark for OCRProcessor.clean_ocr_text
+Times the precompiled single-pass normalisation against the original
+regex-per-rule version on synthetic multi-page reports and reports the
+speed-up as JSON. Their outputs are checked by tests/test_clean_text.py.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import functools
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(ROOT, 'lib'))
+sys.path.append(os.path.join(ROOT, 'tests'))
+from ocr_processor import MEDICAL_FIXES, OCRProcessor
+from test_clean_text import legacy_clean_ocr_text, synthetic_report
+
+def time_calls(function, texts, repeats):
+    """Best-of-repeats wall time to clean every text once, in ms"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for text in texts:
+            function(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Time clean_ocr_text against the original rules')
+    parser.add_argument('--reports', type=int, default=20, help='synthetic reports to clean per timing run')
+    parser.add_argument('--lines', type=int, default=2000, help='lines per synthetic report (~40 per page)')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', metavar='PATH', help='write the JSON report here as well as to stdout')
+    args = parser.parse_args()
+
+    clean = OCRProcessor(ocr_workers=1).clean_ocr_text
+    legacy = functools.partial(legacy_clean_ocr_text, medical_fixes=MEDICAL_FIXES)
+    rng = np.random.default_rng(args.seed)
+    reports = [synthetic_report(rng, args.lines, MEDICAL_FIXES) for _ in range(args.reports)]
+
+    legacy_ms = time_calls(legacy, reports, args.repeats)
+    current_ms = time_calls(clean, reports, args.repeats)
+
+    results = {
+        'reports': args.reports,
+        'mean_report_chars': int(np.mean([len(text) for text in reports])),
+        'legacy_ms': round(legacy_ms, 2),
+        'precompiled_ms': round(current_ms, 2),
+        'speedup': round(legacy_ms / current_ms, 2),
+    }
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+
+if __name__ == "__main__":
+    main()
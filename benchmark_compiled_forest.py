@@ -0,0 +1,79 @@
+"""
+Compare the compiled array forest against sklearn's RandomForest predict_proba
+Checks both give the same probabilities, then times single-row and batch calls
+"""
+
+import json
+import time
+import argparse
+import numpy as np
+
+from model_bundle import BUNDLE_PATH, read_header, load_arrays, load_sklearn_model
+from predict import CompiledForest
+
+def random_symptom_matrix(n_rows, n_features, rng, min_symptoms=1, max_symptoms=8):
+    """Binary feature rows with a handful of symptoms set in each"""
+    X = np.zeros((n_rows, n_features))
+    for row in range(n_rows):
+        count = rng.integers(min_symptoms, max_symptoms + 1)
+        X[row, rng.choice(n_features, size=count, replace=False)] = 1
+    return X
+
+def time_call(func, X, repeats):
+    """Return per-call latencies in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(X)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.array(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the compiled forest against sklearn')
+    parser.add_argument('--bundle', default=BUNDLE_PATH)
+    parser.add_argument('--rows', type=int, default=2000, help='rows used for the parity check and batch timing')
+    parser.add_argument('--repeats', type=int, default=200, help='single-row calls to time')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    header = read_header(args.bundle)
+    model = load_sklearn_model(args.bundle, header)
+    compiled = CompiledForest(load_arrays(args.bundle, header, prefix='forest/'))
+    rng = np.random.default_rng(args.seed)
+    X = random_symptom_matrix(args.rows, compiled.n_features_in_, rng)
+
+    # Parity check
+    max_error = float(np.abs(model.predict_proba(X) - compiled.predict_proba(X)).max())
+    if max_error > 1e-9:
+        raise SystemExit(f"Compiled forest does not match sklearn (max abs error {max_error:.2e})")
+
+    # Single-row latency
+    single_row = X[:1]
+    sklearn_single = time_call(model.predict_proba, single_row, args.repeats)
+    compiled_single = time_call(compiled.predict_proba, single_row, args.repeats)
+
+    # Batch latency
+    sklearn_batch = time_call(model.predict_proba, X, 5)
+    compiled_batch = time_call(compiled.predict_proba, X, 5)
+
+    report = {
+        'max_abs_error': max_error,
+        'single_row_ms': {
+            'sklearn_p50': float(np.percentile(sklearn_single, 50)),
+            'compiled_p50': float(np.percentile(compiled_single, 50)),
+            'sklearn_p99': float(np.percentile(sklearn_single, 99)),
+            'compiled_p99': float(np.percentile(compiled_single, 99)),
+        },
+        'batch_ms': {
+            'rows': args.rows,
+            'sklearn': float(np.median(sklearn_batch)),
+            'compiled': float(np.median(compiled_batch)),
+        },
+    }
+    report['single_row_speedup'] = report['single_row_ms']['sklearn_p50'] / report['single_row_ms']['compiled_p50']
+    report['batch_speedup'] = report['batch_ms']['sklearn'] / report['batch_ms']['compiled']
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
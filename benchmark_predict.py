@@ -0,0 +1,209 @@
+"""
+Reproducible benchmark suite for predict.py
+Generates synthetic symptom workloads from the model bundle and the training
+CSV, then measures cold start, warm single-request latency and batch
+throughput. Results are written as JSON and can be compared to a baseline.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import platform
+import subprocess
+import numpy as np
+
+from model_bundle import BUNDLE_PATH, read_header
+from predict import Predictor
+
+DATASET_PATH = 'Disease and symptoms dataset.csv'
+
+# Metrics where a larger value is a regression; throughput is the reverse
+LOWER_IS_BETTER = ('cold_start_ms', 'warm_p50_ms', 'warm_p99_ms', 'cached_p50_ms')
+HIGHER_IS_BETTER = ('batch_rows_per_s',)
+
+def disease_symptom_profiles(dataset_path, symptom_names):
+    """Per-disease row counts and symptom frequencies from the training CSV
+
+    Returns (disease_weights, profiles) where profiles[d] holds the fraction
+    of disease d's rows that have each symptom. The CSV is streamed with the
+    csv module so pandas is not needed.
+    """
+    column_of = {name: i for i, name in enumerate(symptom_names)}
+    counts, totals = {}, {}
+
+    with open(dataset_path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        columns = [column_of.get(name) for name in header[1:]]
+
+        for row in reader:
+            disease = row[0]
+            if disease not in counts:
+                counts[disease] = np.zeros(len(symptom_names))
+                totals[disease] = 0
+            totals[disease] += 1
+            vector = counts[disease]
+            for column, value in zip(columns, row[1:]):
+                if column is not None and value not in ('0', ''):
+                    vector[column] += 1
+
+    diseases = sorted(counts)
+    weights = np.array([totals[d] for d in diseases], dtype=float)
+    profiles = np.array([counts[d] / totals[d] for d in diseases])
+    return weights / weights.sum(), profiles
+
+def generate_workload(symptom_names, n_requests, rng, profiles=None, min_size=1, max_size=8):
+    """Synthetic symptom sets of varying size
+
+    With profiles, each request picks a disease by its share of training rows
+    and draws symptoms in proportion to how often they co-occur with it;
+    otherwise symptoms are drawn uniformly.
+    """
+    symptom_names = np.asarray(symptom_names)
+    workload = []
+    for _ in range(n_requests):
+        size = int(rng.integers(min_size, max_size + 1))
+        if profiles is not None:
+            weights, frequencies = profiles
+            disease = rng.choice(len(weights), p=weights)
+            p = frequencies[disease] + 1e-3  # keep a little noise outside the profile
+            p = p / p.sum()
+            chosen = rng.choice(len(symptom_names), size=size, replace=False, p=p)
+        else:
+            chosen = rng.choice(len(symptom_names), size=size, replace=False)
+        workload.append(symptom_names[chosen].tolist())
+    return workload
+
+def measure_cold_start(symptoms, runs, bundle=BUNDLE_PATH):
+    """Wall time of one-shot `python predict.py --bundle bundle` invocations, in ms"""
+    timings = []
+    payload = json.dumps(symptoms).encode('utf-8')
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'predict.py')
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, script, '--bundle', bundle], input=payload, capture_output=True)
+        timings.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            raise SystemExit(f'predict.py failed: {result.stdout.decode()} {result.stderr.decode()}')
+    return timings
+
+def measure_warm(predictor, workload):
+    """Per-request latency of an already loaded predictor, in ms"""
+    timings = []
+    for symptoms in workload:
+        start = time.perf_counter()
+        predictor.predict(symptoms)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def measure_batch(predictor, workload, batch_size):
+    """Rows per second scoring the workload in batches of batch_size"""
+    start = time.perf_counter()
+    for offset in range(0, len(workload), batch_size):
+        predictor.predict_batch(workload[offset:offset + batch_size])
+    return len(workload) / (time.perf_counter() - start)
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return a list of metrics that regressed by more than tolerance"""
+    regressions = []
+    for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+        current, previous = results['metrics'].get(metric), baseline['metrics'].get(metric)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        if metric in HIGHER_IS_BETTER:
+            change = -change
+        if change > tolerance:
+            regressions.append({'metric': metric, 'baseline': previous, 'current': current,
+                                'change': round(change, 4)})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark predict.py on synthetic symptom workloads')
+    parser.add_argument('--bundle', default=BUNDLE_PATH)
+    parser.add_argument('--dataset', default=DATASET_PATH,
+                        help='training CSV used for disease-symptom co-occurrence (uniform sampling if missing)')
+    parser.add_argument('--requests', type=int, default=2000, help='warm single requests to time')
+    parser.add_argument('--batch-rows', type=int, default=5000, help='rows in the batch throughput workload')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--cold-runs', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', metavar='PATH', help='write the JSON report here as well as to stdout')
+    parser.add_argument('--baseline', metavar='PATH', help='compare against an earlier report')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='relative slowdown allowed before a metric counts as a regression')
+    args = parser.parse_args()
+
+    header = read_header(args.bundle)
+    symptom_names = header['symptom_names']
+    rng = np.random.default_rng(args.seed)
+
+    profiles = None
+    if os.path.exists(args.dataset):
+        profiles = disease_symptom_profiles(args.dataset, symptom_names)
+
+    single_workload = generate_workload(symptom_names, args.requests, rng, profiles)
+    batch_workload = generate_workload(symptom_names, args.batch_rows, rng, profiles)
+
+    cold = measure_cold_start(single_workload[0], args.cold_runs, bundle=args.bundle)
+
+    # Uncached latency reflects the model; the cached pass reflects the cache hit path
+    predictor = Predictor(cache_size=0, path=args.bundle)
+    warm = measure_warm(predictor, single_workload)
+    throughput = measure_batch(predictor, batch_workload, args.batch_size)
+
+    cached_predictor = Predictor(cache_size=len(single_workload), path=args.bundle)
+    measure_warm(cached_predictor, single_workload)
+    cached = measure_warm(cached_predictor, single_workload)
+
+    results = {
+        'bundle': {
+            'path': args.bundle,
+            'training_data_hash': header.get('training_data_hash'),
+            'created_at': header.get('created_at'),
+            'n_features': header['n_features'],
+            'n_classes': header['n_classes'],
+        },
+        'workload': {
+            'seed': args.seed,
+            'source': 'co-occurrence' if profiles is not None else 'uniform',
+            'requests': args.requests,
+            'batch_rows': args.batch_rows,
+            'batch_size': args.batch_size,
+            'mean_symptoms': round(float(np.mean([len(s) for s in single_workload])), 2),
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+        },
+        'metrics': {
+            'cold_start_ms': round(float(np.median(cold)), 3),
+            'warm_p50_ms': round(float(np.percentile(warm, 50)), 4),
+            'warm_p99_ms': round(float(np.percentile(warm, 99)), 4),
+            'cached_p50_ms': round(float(np.percentile(cached, 50)), 4),
+            'batch_rows_per_s': round(throughput, 1),
+        },
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        results['regressions'] = regressions
+        exit_code = 1 if regressions else 0
+
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Post-training compaction of the model bundle
+Rebuilds the compiled forest from the estimator stored in the bundle with
+three reductions, then reports the held-out accuracy delta:
+
+- subtrees whose leaves all stay within a small L1 distance of the
+  distribution at their root are collapsed into a single leaf
+- trees are dropped greedily while held-out accuracy stays within a budget
+- leaf distributions are stored sparsely (non-zero entries only) at reduced
+  precision
+
+predict.py loads the compacted bundle like any other. The pickled sklearn
+estimator is kept unless --strip-estimator is given, since compaction and
+incremental training start from it; the report shows how much of the
+bundle it accounts for.
+"""
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+from model_bundle import BUNDLE_PATH, read_header, load_arrays, load_sklearn_model, load_test_rows, write_bundle
+from predict import CompiledForest, load_model_and_data
+from train_model import DATASET_PATH, load_and_preprocess_data, tree_arrays, assemble_forest
+
+def prune_tree(tree, tolerance):
+    """Collapse subtrees whose leaves are all within tolerance of the subtree root
+
+    Distances are L1 between class distributions. The deviation of a subtree
+    is bounded by max over children of (child deviation + L1(child, node)),
+    so a collapsed node changes no leaf distribution by more than tolerance.
+    Node ids are in depth-first order, so parents always precede children.
+    """
+    left, right, value = tree['left'], tree['right'], tree['value']
+    node_count = len(left)
+    internal = np.flatnonzero(left != -1)
+
+    # L1 distance from every child to its parent
+    step = np.zeros(node_count)
+    step[left[internal]] = np.abs(value[left[internal]] - value[internal]).sum(axis=1)
+    step[right[internal]] = np.abs(value[right[internal]] - value[internal]).sum(axis=1)
+
+    deviation = np.zeros(node_count)
+    for node in internal[::-1]:
+        deviation[node] = max(deviation[left[node]] + step[left[node]],
+                              deviation[right[node]] + step[right[node]])
+    collapse = (left != -1) & (deviation <= tolerance)
+
+    # Keep nodes reachable from the root without passing a collapsed node
+    keep = np.zeros(node_count, dtype=bool)
+    keep[0] = True
+    for node in internal:
+        if keep[node] and not collapse[node]:
+            keep[left[node]] = keep[right[node]] = True
+
+    new_id = np.cumsum(keep) - 1
+    is_split = keep & (left != -1) & ~collapse
+    kept = np.flatnonzero(keep)
+    depth = np.zeros(node_count, dtype=np.int64)
+    for node in kept:
+        if is_split[node]:
+            depth[left[node]] = depth[right[node]] = depth[node] + 1
+
+    return {
+        'feature': tree['feature'][kept],
+        'threshold': tree['threshold'][kept],
+        'left': np.where(is_split, new_id[np.maximum(left, 0)], -1)[kept],
+        'right': np.where(is_split, new_id[np.maximum(right, 0)], -1)[kept],
+        'value': value[kept],
+        'max_depth': int(depth[kept].max()),
+    }
+
+def accuracy_of(scores, labels):
+    return float((scores.argmax(axis=1) == labels).mean()) if len(labels) else 0.0
+
+def select_trees(arrays, X, labels, max_drop, min_trees):
+    """Greedily drop trees while accuracy on X stays within max_drop of the full forest
+
+    Trees whose individual removal costs the least are tried first. Returns
+    the indices of the trees to keep.
+    """
+    forest = CompiledForest(arrays)
+    leaves = forest.leaf_index[forest.apply(X)]
+    n_trees = leaves.shape[1]
+
+    def tree_scores(tree):
+        return forest.leaf_values[leaves[:, tree]]
+
+    total = sum(tree_scores(tree) for tree in range(n_trees))
+    baseline = accuracy_of(total, labels)
+    impact = [accuracy_of(total - tree_scores(tree), labels) for tree in range(n_trees)]
+
+    kept = set(range(n_trees))
+    for tree in np.argsort(impact, kind='stable')[::-1]:
+        if len(kept) <= min_trees:
+            break
+        candidate = total - tree_scores(tree)
+        if accuracy_of(candidate, labels) >= baseline - max_drop:
+            total = candidate
+            kept.remove(int(tree))
+
+    return sorted(kept)
+
+def sparse_leaves(leaf_values, precision='float16', min_prob=0.0):
+    """CSR-style leaf table holding only entries above min_prob, renormalized per leaf
+
+    Every leaf keeps at least its most probable class, so a min_prob above a
+    leaf's largest entry cannot empty it.
+    """
+    keep = leaf_values > min_prob
+    keep[np.arange(len(leaf_values)), leaf_values.argmax(axis=1)] = True
+    values = np.where(keep, leaf_values, 0.0)
+    values /= values.sum(axis=1, keepdims=True)
+    leaf_rows, leaf_classes = np.nonzero(values)
+
+    leaf_ptr = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(leaf_rows, minlength=len(values)), out=leaf_ptr[1:])
+    class_dtype = np.uint16 if values.shape[1] <= np.iinfo(np.uint16).max else np.int32
+
+    return {
+        'leaf_ptr': leaf_ptr,
+        'leaf_classes': leaf_classes.astype(class_dtype),
+        'leaf_probs': values[leaf_rows, leaf_classes].astype(precision),
+        'n_classes': np.array(values.shape[1], dtype=np.int32),
+    }
+
+def narrow_node_arrays(arrays):
+    """Store node features and thresholds in the smallest dtype that keeps them exact"""
+    arrays = dict(arrays)
+    if int(arrays['n_features']) <= np.iinfo(np.int16).max:
+        arrays['feature'] = arrays['feature'].astype(np.int16)
+    threshold = arrays['threshold'].astype(np.float32)
+    if np.array_equal(threshold, arrays['threshold']):
+        arrays['threshold'] = threshold
+    return arrays
+
+def compact_forest(model, X_select, y_select, tolerance=0.02, max_drop=0.0, min_trees=None,
+                   precision='float16', min_prob=0.0):
+    """Return the compacted forest arrays for model
+
+    X_select and y_select (class indices) drive the tree selection, which
+    keeps at least min_trees trees (default: half the forest); a small
+    selection set saturates quickly, so the floor guards against overfitting it.
+    """
+    if min_trees is None:
+        min_trees = (len(model.estimators_) + 1) // 2
+    trees = [prune_tree(tree_arrays(estimator.tree_), tolerance) for estimator in model.estimators_]
+    pruned = assemble_forest(trees, model.n_features_in_)
+
+    if max_drop is not None and len(trees) > min_trees:
+        keep = select_trees(pruned, X_select, y_select, max_drop, min_trees)
+        pruned = assemble_forest([trees[i] for i in keep], model.n_features_in_)
+
+    compacted = narrow_node_arrays(pruned)
+    compacted.update(sparse_leaves(compacted.pop('leaf_values'), precision, min_prob))
+    return compacted
+
+def forest_bytes(arrays):
+    return int(sum(np.asarray(array).nbytes for array in arrays.values()))
+
+def time_load(path):
+    start = time.perf_counter()
+    load_model_and_data(path=path)
+    return round((time.perf_counter() - start) * 1000, 2)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact the model bundle and report the accuracy delta')
+    parser.add_argument('--bundle', default=BUNDLE_PATH)
+    parser.add_argument('--output', default=None, help='compacted bundle path (default: overwrite --bundle)')
+    parser.add_argument('--dataset', default=DATASET_PATH,
+                        help='training CSV; its held-out split is used for tree selection and the report')
+    parser.add_argument('--tolerance', type=float, default=0.02,
+                        help='max L1 change of any leaf distribution when collapsing a subtree')
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.0,
+                        help='accuracy the tree selection may give up on its half of the held-out split')
+    parser.add_argument('--min-trees', type=int, default=None,
+                        help='never keep fewer trees than this (default: half the forest)')
+    parser.add_argument('--precision', choices=('float16', 'float32'), default='float16')
+    parser.add_argument('--min-prob', type=float, default=0.0,
+                        help='drop leaf probabilities at or below this value before renormalizing '
+                             '(each leaf keeps its most probable class)')
+    parser.add_argument('--strip-estimator', action='store_true',
+                        help='drop the pickled sklearn estimator, usually most of the compacted bundle '
+                             '(compact_model.py and train_model.py --incremental need it)')
+    parser.add_argument('--report', metavar='PATH', help='write the JSON report here as well as to stdout')
+    args = parser.parse_args()
+    output = args.output or args.bundle
+
+    header = read_header(args.bundle)
+    if 'sklearn/model' not in header['arrays']:
+        raise SystemExit(f'{args.bundle} has no sklearn estimator to compact from; retrain first')
+    model = load_sklearn_model(args.bundle, header)
+    estimator_bytes = int(np.prod(header['arrays']['sklearn/model']['shape']))
+    original = load_arrays(args.bundle, header, prefix='forest/')
+
+    # Same held-out split as train_model.py, halved: one half picks trees, the other is reported
+    diseases, symptoms = load_and_preprocess_data(args.dataset)
+    symptoms = symptoms[header['symptom_names']]
+    test_rows = load_test_rows(args.bundle, header)
+    if test_rows is not None:
+        X_test, y_test = symptoms.iloc[test_rows], diseases.iloc[test_rows]
+    else:
+        _, X_test, _, y_test = train_test_split(symptoms, diseases, test_size=0.2, random_state=42)
+    X_test = X_test.to_numpy(dtype=np.float32)
+    class_index = {disease: i for i, disease in enumerate(header['diseases'])}
+    y_test = np.array([class_index.get(disease, -1) for disease in y_test])
+    order = np.random.default_rng(0).permutation(len(y_test))
+    select, evaluate = order[:len(order) // 2], order[len(order) // 2:]
+
+    compacted = compact_forest(
+        model, X_test[select], y_test[select],
+        tolerance=args.tolerance, max_drop=args.max_accuracy_drop, min_trees=args.min_trees,
+        precision=args.precision, min_prob=args.min_prob
+    )
+
+    before = CompiledForest(original).predict_proba(X_test[evaluate])
+    after = CompiledForest(compacted).predict_proba(X_test[evaluate])
+    accuracy_before = accuracy_of(before, y_test[evaluate])
+    accuracy_after = accuracy_of(after, y_test[evaluate])
+
+    settings = {
+        'tolerance': args.tolerance,
+        'max_accuracy_drop': args.max_accuracy_drop,
+        'min_trees': args.min_trees if args.min_trees is not None else (len(model.estimators_) + 1) // 2,
+        'precision': args.precision,
+        'min_prob': args.min_prob,
+    }
+    new_header = {key: value for key, value in header.items()
+                  if key not in ('arrays', 'data_start', 'format_version')}
+    new_header['compaction'] = dict(settings, source_trees=len(model.estimators_))
+    arrays = {f'forest/{name}': array for name, array in compacted.items()}
+    # Carry over everything else in the bundle, such as the next-symptom index
+    for name, array in load_arrays(args.bundle, header).items():
+        if not name.startswith('forest/') and not (args.strip_estimator and name == 'sklearn/model'):
+            arrays[name] = array
+
+    size_before = os.path.getsize(args.bundle)
+    load_before = time_load(args.bundle)
+    write_bundle(output, new_header, arrays)
+
+    report = {
+        'settings': settings,
+        'evaluation_rows': int(len(evaluate)),
+        'accuracy_before': round(accuracy_before, 4),
+        'accuracy_after': round(accuracy_after, 4),
+        'accuracy_delta': round(accuracy_after - accuracy_before, 4),
+        'top1_agreement': round(float((before.argmax(axis=1) == after.argmax(axis=1)).mean()), 4),
+        'trees': [len(original['roots']), len(compacted['roots'])],
+        'nodes': [len(original['feature']), len(compacted['feature'])],
+        'leaf_entries': [int(original['leaf_values'].size), int(len(compacted['leaf_probs']))],
+        'forest_bytes': [forest_bytes(original), forest_bytes(compacted)],
+        'bundle_bytes': [size_before, os.path.getsize(output)],
+        'estimator_bytes': estimator_bytes if not args.strip_estimator else 0,
+        'load_ms': [load_before, time_load(output)],
+        'output': output,
+    }
+    if not args.strip_estimator:
+        report['note'] = ('bundle_bytes include the pickled sklearn estimator; '
+                          'pass --strip-estimator to drop it if the bundle will not be compacted or grown again')
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(text + '\n')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare the model backends stored in the model bundle
+Scores the training CSV's held-out split with every backend predict.py can
+load and reports accuracy, top-5 recall, single-row and batch latency, load
+time and the size of each backend's arrays in the bundle as JSON.
+"""
+
+import time
+import json
+import argparse
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+from model_bundle import BUNDLE_PATH, read_header, load_test_rows
+from predict import BACKENDS, CompiledForest, forest_uses_estimator, load_model_and_data, top_k_indices
+from train_model import DATASET_PATH, load_and_preprocess_data
+
+def backend_bytes(header, backend):
+    """Bytes of the arrays a backend loads from the bundle"""
+    prefix = 'forest/' if backend == 'forest' else f'backends/{backend}/'
+    return sum(
+        np.dtype(spec['dtype']).itemsize * int(np.prod(spec['shape']))
+        for name, spec in header['arrays'].items()
+        if name.startswith(prefix)
+    )
+
+def evaluate_backend(bundle, backend, X, labels, single_repeats, top_k=5):
+    """Accuracy, top-k recall and latency of one backend on X
+
+    The batch is timed after an untimed warm-up call, so a forest that hands
+    large batches to its sklearn estimator is measured without the one-off
+    unpickle.
+    """
+    start = time.perf_counter()
+    model = load_model_and_data(path=bundle, backend=backend)[0]
+    load_ms = (time.perf_counter() - start) * 1000
+
+    model.predict_proba(X)
+    start = time.perf_counter()
+    proba = model.predict_proba(X)
+    batch_seconds = time.perf_counter() - start
+    top = top_k_indices(proba, top_k)
+
+    single = []
+    for row in range(min(single_repeats, len(X))):
+        start = time.perf_counter()
+        model.predict_proba(X[row:row + 1])
+        single.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'accuracy': round(float((top[:, 0] == labels).mean()), 4),
+        f'top{top_k}_recall': round(float((top == labels[:, None]).any(axis=1).mean()), 4),
+        'single_row_p50_ms': round(float(np.percentile(single, 50)), 4),
+        'single_row_p99_ms': round(float(np.percentile(single, 99)), 4),
+        'batch_rows_per_s': round(len(X) / batch_seconds, 1),
+        'load_ms': round(load_ms, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the model backends in the bundle on held-out data')
+    parser.add_argument('--bundle', default=BUNDLE_PATH)
+    parser.add_argument('--dataset', default=DATASET_PATH,
+                        help='training CSV; its held-out split (as in train_model.py) is scored')
+    parser.add_argument('--single-repeats', type=int, default=500, help='single-row predictions to time')
+    parser.add_argument('--output', metavar='PATH', help='write the JSON report here as well as to stdout')
+    args = parser.parse_args()
+
+    header = read_header(args.bundle)
+    diseases, symptoms = load_and_preprocess_data(args.dataset)
+    symptoms = symptoms[header['symptom_names']]
+    test_rows = load_test_rows(args.bundle, header)
+    if test_rows is not None:
+        X_test, y_test = symptoms.iloc[test_rows], diseases.iloc[test_rows]
+    else:
+        _, X_test, _, y_test = train_test_split(symptoms, diseases, test_size=0.2, random_state=42)
+    X_test = X_test.to_numpy(dtype=np.float32)
+    class_index = {disease: i for i, disease in enumerate(header['diseases'])}
+    labels = np.array([class_index.get(disease, -1) for disease in y_test])
+
+    available = [backend for backend in BACKENDS if backend in header.get('backends', {'forest': {}})]
+    report = {'bundle': args.bundle, 'evaluation_rows': len(labels), 'backends': {}}
+    for backend in available:
+        result = evaluate_backend(args.bundle, backend, X_test, labels, args.single_repeats)
+        result['artifact_bytes'] = backend_bytes(header, backend)
+        if backend == 'forest' and forest_uses_estimator(header) and len(X_test) >= CompiledForest.LARGE_BATCH:
+            # The batch figure is the sklearn estimator's, which artifact_bytes leaves out
+            result['batch_estimator_bytes'] = int(np.prod(header['arrays']['sklearn/model']['shape']))
+        report['backends'][backend] = result
+
+    # Express every backend relative to the random forest
+    forest = report['backends']['forest']
+    for backend, result in report['backends'].items():
+        result['vs_forest'] = {
+            'accuracy_delta': round(result['accuracy'] - forest['accuracy'], 4),
+            'top5_recall_delta': round(result['top5_recall'] - forest['top5_recall'], 4),
+            'single_row_speedup': round(forest['single_row_p50_ms'] / result['single_row_p50_ms'], 2),
+            'size_ratio': round(result['artifact_bytes'] / forest['artifact_bytes'], 4),
+        }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Content-addressed on-disk cache for OCR results
+Entries are keyed by the SHA-256 of the uploaded file plus every setting
+that affects the output (OCR config, DPI, model name), so re-uploading the
+same report skips rasterisation, Tesseract and LLaVA. The directory is
+shared by every process using it: entries are written atomically and the
+least recently used ones are evicted once the byte budget is exceeded.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from typing import Optional
+
+# Bump when a change to the pipeline makes cached text stale
+OCR_CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.ocr_cache')
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+# Temp files older than this were left by a crashed writer
+STALE_TEMP_SECONDS = 3600
+
+def cache_key(file_bytes: bytes, **settings) -> str:
+    """SHA-256 over the file bytes and the settings that produced its text"""
+    digest = hashlib.sha256(file_bytes)
+    digest.update(b'\0')
+    digest.update(json.dumps(dict(settings, version=OCR_CACHE_VERSION), sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+class OCRCache:
+    """Size-bounded LRU cache of text entries in a directory
+
+    A max_bytes of 0 disables the cache. Recency is the entry's mtime,
+    refreshed on every hit, so it is shared across processes.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.directory = os.path.abspath(directory or os.environ.get('OCR_CACHE_DIR', DEFAULT_CACHE_DIR))
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('OCR_CACHE_MAX_BYTES', DEFAULT_CACHE_BYTES))
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.txt')
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached text for key, or None"""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+            os.utime(path)
+        except OSError:
+            # Missing, or evicted by another process between open and utime
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        """Store text under key atomically, then evict down to the byte budget
+
+        Readers never see a partial entry: the text is written to a temp file
+        in the same directory and renamed over the entry.
+        """
+        if not self.enabled:
+            return
+        data = text.encode('utf-8')
+        if len(data) > self.max_bytes:
+            return
+        temp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=f'{key[:16]}.', suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, self._path(key))
+            self._evict()
+        except OSError as e:
+            # A cache that cannot be written must not fail the OCR request
+            print(f"OCR cache write failed: {e}")
+            if temp_path is not None:
+                self._remove(temp_path)
+
+    def _evict(self):
+        """Delete least recently used entries until the directory fits max_bytes"""
+        entries, total = [], 0
+        now = time.time()
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.name.endswith('.txt'):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+                elif entry.name.endswith('.tmp') and now - stat.st_mtime > STALE_TEMP_SECONDS:
+                    self._remove(entry.path)
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                with self._lock:
+                    self.evictions += 1
+            total -= size
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except OSError:
+            # Already evicted by another process, or open elsewhere on Windows
+            return False
+
+    def stats(self) -> dict:
+        """Hit, miss and eviction counters for this process"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'directory': self.directory,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -8,11 +8,18 @@ import pytesseract
 from PIL import Image
 import io
 import base64
-from pdf2image import convert_from_bytes
+from pdf2image import convert_from_path
 import re
 import json
-import requests
-from typing import Dict, Optional
+import math
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ocr_cache import OCRCache, cache_key
+from ollama_client import OllamaClient, OllamaUnavailable
 
 # Configure Tesseract path for Windows
 import os
@@ -20,10 +27,147 @@ tesseract_path = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 if os.path.exists(tesseract_path):
     pytesseract.pytesseract.tesseract_cmd = tesseract_path
 
+# Enhanced OCR configuration for medical documents
+OCR_CONFIG = '--oem 3 --psm 6'
+
+# Text normalisation rules for clean_ocr_text, compiled once
+_WHITESPACE = re.compile(r'\s+')
+_OCR_CHAR_FIXES = str.maketrans({'|': 'I', '0': 'O', '1': 'l'})
+_NOISE = re.compile(r'[^\w\s\.\,\:\;\-\+\=\/\(\)\[\]\{\}\%\@\#\$\*\!\?\'\"]')
+_PUNCTUATION_SPACING = re.compile(r'\s+([\.\,\:\;\-\+\=\/\(\)\[\]\{\}\%\@\#\$\*\!\?])\s*')
+
+# Common medical abbreviations; matched case-insensitively as whole words
+MEDICAL_FIXES = {
+    'Hgb': 'Hemoglobin',
+    'Hct': 'Hematocrit',
+    'WBC': 'White Blood Cells',
+    'RBC': 'Red Blood Cells',
+    'Plt': 'Platelets',
+    'HDL': 'HDL Cholesterol',
+    'LDL': 'LDL Cholesterol',
+    'Trig': 'Triglycerides',
+    'Chol': 'Total Cholesterol',
+    'Glu': 'Glucose',
+    'Creat': 'Creatinine',
+    'Na': 'Sodium',
+    'K': 'Potassium',
+    'Cl': 'Chloride',
+    'Ca': 'Calcium',
+    'ALT': 'ALT',
+    'AST': 'AST',
+    'ALP': 'Alkaline Phosphatase',
+    'Bil': 'Total Bilirubin',
+    'Alb': 'Albumin',
+    'CRP': 'C-Reactive Protein',
+    'ESR': 'ESR',
+    'Trop': 'Troponin',
+    'BNP': 'BNP'
+}
+# No expansion contains another abbreviation as a whole word, so one pass
+# gives the same result as substituting each abbreviation in turn
+_ABBREVIATION_LOOKUP = {abbr.lower(): full_name for abbr, full_name in MEDICAL_FIXES.items()}
+_ABBREVIATIONS = re.compile(
+    r'\b(?:' + '|'.join(re.escape(abbr) for abbr in MEDICAL_FIXES) + r')\b', re.IGNORECASE
+)
+
+def _expand_abbreviation(match) -> str:
+    word = match.group(0)
+    full_name = _ABBREVIATION_LOOKUP.get(word.lower())
+    if full_name is None:
+        # Letters such as the dotless i or long s match case-insensitively but do not lowercase to the key
+        full_name = next(full for abbr, full in MEDICAL_FIXES.items() if re.fullmatch(abbr, word, re.IGNORECASE))
+    return full_name
+
+# Larger PDFs and pages are rejected instead of being rasterised
+DEFAULT_MAX_PAGES = 50
+DEFAULT_MAX_PAGE_PIXELS = 25_000_000  # A3 at 300 dpi is ~17.4M pixels
+DEFAULT_DPI = 200
+
+def _strip_code_fence(text: str) -> str:
+    """LLaVA's answer as plain text: surrounding whitespace and a markdown code fence removed"""
+    cleaned = text.strip()
+    if cleaned.startswith('```'):
+        cleaned = cleaned.strip('`').strip()
+    return cleaned
+
+def _stable_prefix(partial: str) -> str:
+    """Part of a partial LLaVA answer that _strip_code_fence keeps whatever follows it"""
+    text = partial.lstrip()
+    if '```'.startswith(text):
+        # Too short to tell whether the answer opens with a code fence
+        return ''
+    if not text.startswith('```'):
+        return text.rstrip()
+    text = text.lstrip('`').lstrip()
+    trimmed = None
+    while trimmed != text:
+        trimmed, text = text, text.rstrip().rstrip('`')
+    return text
+
+_PDFINFO_PAGES = re.compile(r'^Pages:\s+(\d+)', re.M)
+_PDFINFO_SIZE = re.compile(r'^Page\s+(?:(\d+)\s+)?size:\s+([\d.]+(?:e[+-]?\d+)?) x ([\d.]+(?:e[+-]?\d+)?) pts', re.M)
+_PDFINFO_BOX = re.compile(r'^(?:Page\s+(\d+)\s+)?(?:Media|Crop|Bleed|Trim|Art)Box:'
+                          r'\s+(-?[\d.]+)\s+(-?[\d.]+)\s+(-?[\d.]+)\s+(-?[\d.]+)', re.M)
+
+def pdf_page_sizes(pdf_path: str, last_page: int, timeout: float = 30) -> Tuple[int, Dict[int, Tuple[float, float]]]:
+    """Page count and the (width, height) in points of pages 1..last_page, from poppler's pdfinfo
+    
+    pdftoppm renders the MediaBox, which the reported page size (the
+    CropBox) can understate, so each page gets the largest extent of any of
+    its boxes.
+    """
+    try:
+        result = subprocess.run(['pdfinfo', '-box', '-f', '1', '-l', str(last_page), pdf_path],
+                                capture_output=True, timeout=timeout)
+    except FileNotFoundError:
+        raise Exception("pdfinfo not found; is poppler installed and in PATH?")
+    output = result.stdout.decode('utf-8', 'ignore')
+    pages = _PDFINFO_PAGES.search(output)
+    if result.returncode != 0 or not pages:
+        raise Exception(f"Could not read the PDF: {result.stderr.decode('utf-8', 'ignore').strip()}")
+    
+    # A single-page listing leaves out the page numbers
+    sizes = {}
+    extents = [(page, float(width), float(height)) for page, width, height in _PDFINFO_SIZE.findall(output)]
+    extents += [(page, abs(float(x2) - float(x1)), abs(float(y2) - float(y1)))
+                for page, x1, y1, x2, y2 in _PDFINFO_BOX.findall(output)]
+    for page, width, height in extents:
+        page = int(page or 1)
+        known_width, known_height = sizes.get(page, (0.0, 0.0))
+        sizes[page] = (max(known_width, width), max(known_height, height))
+    return int(pages.group(1)), sizes
+
+def default_ocr_workers() -> int:
+    """Pages OCR'd in parallel: $OCR_WORKERS, else up to 4 cores"""
+    configured = os.environ.get('OCR_WORKERS')
+    if configured:
+        return max(1, int(configured))
+    return max(1, min(4, os.cpu_count() or 1))
+
 class OCRProcessor:
-    def __init__(self):
+    def __init__(self, ocr_workers: Optional[int] = None, max_pages: Optional[int] = None,
+                 max_page_pixels: Optional[int] = None, dpi: int = DEFAULT_DPI,
+                 cache: Optional[OCRCache] = None, ollama_url: Optional[str] = None,
+                 ollama: Optional[OllamaClient] = None):
         self.tesseract_available = self._check_tesseract()
-        self.ollama_url = "http://localhost:11434"
+        # One pooled client per processor; ollama_url defaults to $OLLAMA_URL
+        self.ollama = ollama or OllamaClient(ollama_url)
+        self.ollama_url = self.ollama.base_url
+        self.llava_model = "llava"
+        # Shared on-disk result cache; OCRCache(max_bytes=0) disables it
+        self.cache = cache if cache is not None else OCRCache()
+        self.max_pages = max_pages or int(os.environ.get('OCR_MAX_PAGES', DEFAULT_MAX_PAGES))
+        self.max_page_pixels = max_page_pixels or int(os.environ.get('OCR_MAX_PAGE_PIXELS', DEFAULT_MAX_PAGE_PIXELS))
+        self.dpi = dpi
+        
+        # Each Tesseract call is a single-threaded subprocess, so pages are
+        # OCR'd from a thread pool. The semaphore caps the Tesseract processes
+        # this processor runs at once, across concurrent requests too.
+        self.ocr_workers = ocr_workers or default_ocr_workers()
+        self._tesseract_slots = threading.BoundedSemaphore(self.ocr_workers)
+        if self.ocr_workers > 1:
+            # Stop each Tesseract process from also spawning OpenMP threads
+            os.environ.setdefault('OMP_THREAD_LIMIT', '1')
         
     def _check_tesseract(self) -> bool:
         """Check if Tesseract is available"""
@@ -39,66 +183,91 @@ class OCRProcessor:
             return ""
         
         # Remove excessive whitespace and normalize
-        text = re.sub(r'\s+', ' ', text.strip())
+        text = _WHITESPACE.sub(' ', text.strip())
         
-        # Fix common OCR errors
-        text = re.sub(r'[|]', 'I', text)  # Fix vertical bars to I
-        text = re.sub(r'[0]', 'O', text)  # Fix 0 to O in text contexts
-        text = re.sub(r'[1]', 'l', text)  # Fix 1 to l in text contexts
+        # Fix common OCR errors: vertical bars to I, 0 to O and 1 to l in text contexts
+        text = text.translate(_OCR_CHAR_FIXES)
         
         # Remove noise characters
-        text = re.sub(r'[^\w\s\.\,\:\;\-\+\=\/\(\)\[\]\{\}\%\@\#\$\*\!\?\'\"]', '', text)
+        text = _NOISE.sub('', text)
         
         # Fix spacing around punctuation
-        text = re.sub(r'\s+([\.\,\:\;\-\+\=\/\(\)\[\]\{\}\%\@\#\$\*\!\?])\s*', r'\1', text)
+        text = _PUNCTUATION_SPACING.sub(r'\1', text)
         
-        # Fix common medical abbreviations
-        medical_fixes = {
-            'Hgb': 'Hemoglobin',
-            'Hct': 'Hematocrit',
-            'WBC': 'White Blood Cells',
-            'RBC': 'Red Blood Cells',
-            'Plt': 'Platelets',
-            'HDL': 'HDL Cholesterol',
-            'LDL': 'LDL Cholesterol',
-            'Trig': 'Triglycerides',
-            'Chol': 'Total Cholesterol',
-            'Glu': 'Glucose',
-            'Creat': 'Creatinine',
-            'Na': 'Sodium',
-            'K': 'Potassium',
-            'Cl': 'Chloride',
-            'Ca': 'Calcium',
-            'ALT': 'ALT',
-            'AST': 'AST',
-            'ALP': 'Alkaline Phosphatase',
-            'Bil': 'Total Bilirubin',
-            'Alb': 'Albumin',
-            'CRP': 'C-Reactive Protein',
-            'ESR': 'ESR',
-            'Trop': 'Troponin',
-            'BNP': 'BNP'
-        }
-        
-        for abbr, full_name in medical_fixes.items():
-            text = re.sub(rf'\b{abbr}\b', full_name, text, flags=re.IGNORECASE)
+        # Fix common medical abbreviations in one pass
+        text = _ABBREVIATIONS.sub(_expand_abbreviation, text)
         
         return text.strip()
         
+    def _ocr_image(self, image) -> str:
+        """Run Tesseract on one image (or image file path), waiting for a free Tesseract slot"""
+        with self._tesseract_slots:
+            return pytesseract.image_to_string(image, config=OCR_CONFIG)
+    
+    def _ocr_pages(self, images) -> List[str]:
+        """OCR pages in parallel, returning their text in page order"""
+        if self.ocr_workers <= 1 or len(images) <= 1:
+            return [self._ocr_image(image) for image in images]
+        with ThreadPoolExecutor(max_workers=min(self.ocr_workers, len(images))) as pool:
+            return list(pool.map(self._ocr_image, images))
+    
+    def _check_page_pixels(self, page_number: int, size: Optional[Tuple[float, float]]):
+        """Reject a page that would rasterise to more than max_page_pixels at self.dpi
+        
+        size is the page's (width, height) in points, as reported by
+        pdf_page_sizes, so oversized pages are refused before pdftoppm runs.
+        """
+        if size is None:
+            raise Exception(f"Could not read the size of page {page_number}")
+        width, height = (math.ceil(side * self.dpi / 72) for side in size)
+        if width * height > self.max_page_pixels:
+            raise Exception(
+                f"Page {page_number} would be {width}x{height} pixels at {self.dpi} dpi; "
+                f"the limit is {self.max_page_pixels} pixels per page"
+            )
+    
+    def _ocr_pdf_pages(self, pdf_bytes: bytes) -> List[str]:
+        """Rasterise and OCR a PDF a window of pages at a time
+        
+        The page count and every page's size are checked with pdfinfo before
+        anything is rendered. Each window (one page per OCR worker) is then
+        rendered by pdftoppm into a temporary directory and OCR'd from the
+        files, which are deleted before the next window is rendered. Page
+        images are never decoded in this process, so memory stays flat
+        however long the PDF is.
+        """
+        texts = []
+        window = max(1, self.ocr_workers)
+        with tempfile.TemporaryDirectory(prefix='ocr-pages-') as folder:
+            # Written once and shared by pdfinfo and every pdftoppm call
+            pdf_path = os.path.join(folder, 'document.pdf')
+            with open(pdf_path, 'wb') as f:
+                f.write(pdf_bytes)
+            
+            page_count, sizes = pdf_page_sizes(pdf_path, self.max_pages)
+            if page_count > self.max_pages:
+                raise Exception(f"PDF has {page_count} pages; the limit is {self.max_pages}")
+            for page_number in range(1, page_count + 1):
+                self._check_page_pixels(page_number, sizes.get(page_number))
+            
+            for first in range(1, page_count + 1, window):
+                last = min(first + window - 1, page_count)
+                paths = convert_from_path(pdf_path, dpi=self.dpi, first_page=first, last_page=last,
+                                          output_folder=folder, paths_only=True)
+                try:
+                    texts.extend(self._ocr_pages(paths))
+                finally:
+                    for path in paths:
+                        os.unlink(path)
+        return texts
+    
     def process_pdf(self, pdf_bytes: bytes) -> str:
         """Extract full text from PDF using OCR with enhanced processing"""
         if not self.tesseract_available:
             raise Exception("Tesseract OCR is not installed")
             
         try:
-            images = convert_from_bytes(pdf_bytes)
-            full_text = ""
-            
-            for i, img in enumerate(images):
-                # Use enhanced OCR configuration for medical documents
-                custom_config = '--oem 3 --psm 6'
-                text = pytesseract.image_to_string(img, config=custom_config)
-                full_text += text + "\n"
+            full_text = "".join(text + "\n" for text in self._ocr_pdf_pages(pdf_bytes))
             
             # Clean and refine the extracted text
             cleaned_text = self.clean_ocr_text(full_text)
@@ -114,10 +283,7 @@ class OCRProcessor:
             
         try:
             image = Image.open(io.BytesIO(image_bytes))
-            
-            # Use enhanced OCR configuration for medical documents
-            custom_config = '--oem 3 --psm 6'
-            text = pytesseract.image_to_string(image, config=custom_config)
+            text = self._ocr_image(image)
             
             # Clean and refine the extracted text
             cleaned_text = self.clean_ocr_text(text)
@@ -126,55 +292,64 @@ class OCRProcessor:
         except Exception as e:
             raise Exception(f"Image processing failed: {str(e)}")
     
+    def _cache_key(self, file_bytes: bytes, file_type: str, model: Optional[str] = None) -> str:
+        """Cache key for the OCR text of a file, or for its LLaVA output when model is given"""
+        return cache_key(
+            file_bytes,
+            file_type='pdf' if file_type.lower() == 'pdf' else 'image',
+            ocr_config=OCR_CONFIG,
+            dpi=self.dpi,
+            model=model
+        )
+    
+    def extract_text(self, file_bytes: bytes, file_type: str) -> str:
+        """OCR text of a PDF or image, served from the cache when the same file was seen before"""
+        key = self._cache_key(file_bytes, file_type)
+        text = self.cache.get(key)
+        if text is None:
+            if file_type.lower() == "pdf":
+                text = self.process_pdf(file_bytes)
+            else:
+                text = self.process_image(file_bytes)
+            self.cache.put(key, text)
+        return text
+    
     def process_with_llava(self, extracted_text: str) -> str:
         """Process extracted text with LLaVA for refinement and analysis, return only cleaned text"""
-        try:
-            # Check if Ollama is running
-            try:
-                test_response = requests.get(f"{self.ollama_url}/api/tags", timeout=5)
-                if test_response.status_code != 200:
-                    raise Exception("Ollama not responding")
-            except Exception:
-                # If Ollama is not available, return just OCR text
-                return extracted_text
-            
-            # Prepare enhanced prompt for LLaVA
-            prompt = f"""
+        refined = self._refine_with_llava(extracted_text)
+        return extracted_text if refined is None else refined
+    
+    def _llava_payload(self, extracted_text: str) -> Dict:
+        """Ollama /api/generate request asking LLaVA to clean up OCR text"""
+        # Prepare enhanced prompt for LLaVA
+        prompt = f"""
 You are a medical document analysis expert. Clean and correct the following OCR-extracted text from a medical test report. Fix OCR errors, improve readability, and output only the cleaned, corrected, and well-formatted text. Do not return any JSON or structured data, just the cleaned text.
 
 Extracted OCR text:
 {extracted_text}
 """
-            
-            # Call LLaVA via Ollama with increased timeout
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json={
-                    "model": "llava",
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.1,
-                        "top_p": 0.9,
-                        "num_predict": 2048
-                    }
-                },
-                timeout=180  # Increased timeout to 3 minutes
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                llava_response = result.get('response', '')
-                # Return the response as plain text (strip markdown if present)
-                cleaned = llava_response.strip()
-                # Remove markdown code block if present
-                if cleaned.startswith('```'):
-                    cleaned = cleaned.strip('`').strip()
-                return cleaned
-            else:
-                return extracted_text
+        return {
+            "model": self.llava_model,
+            "prompt": prompt,
+            "options": {
+                "temperature": 0.1,
+                "top_p": 0.9,
+                "num_predict": 2048
+            }
+        }
+    
+    def _refine_with_llava(self, extracted_text: str) -> Optional[str]:
+        """LLaVA's cleaned text, or None if Ollama is unavailable or the request failed"""
+        try:
+            # Call LLaVA via the pooled client; it fails fast while Ollama is known to be down
+            result = self.ollama.generate(self._llava_payload(extracted_text), timeout=180)  # 3 minutes
+            # Return the response as plain text (strip markdown if present)
+            return _strip_code_fence(result.get('response', ''))
+        except OllamaUnavailable:
+            # The caller falls back to the OCR text
+            return None
         except Exception:
-            return extracted_text
+            return None
 
     def process_document(self, file_bytes: bytes, file_type: str) -> str:
         """Complete document processing pipeline: Enhanced OCR + LLaVA, returns only cleaned text"""
@@ -182,13 +357,65 @@ Extracted OCR text:
             # Check if Tesseract is available
             if not self.tesseract_available:
                 return "Tesseract OCR is not installed."
+            key = self._cache_key(file_bytes, file_type, model=self.llava_model)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
             # Extract text using enhanced OCR
-            if file_type.lower() == "pdf":
-                extracted_text = self.process_pdf(file_bytes)
-            else:
-                extracted_text = self.process_image(file_bytes)
+            extracted_text = self.extract_text(file_bytes, file_type)
             # Process with enhanced LLaVA, return only cleaned text
-            cleaned_text = self.process_with_llava(extracted_text)
+            cleaned_text = self._refine_with_llava(extracted_text)
+            if cleaned_text is None:
+                # Not cached, so the next upload retries LLaVA
+                return extracted_text
+            self.cache.put(key, cleaned_text)
             return cleaned_text
         except Exception as e:
-            return f"Error: {str(e)}" 
\ No newline at end of file
+            return f"Error: {str(e)}" 
+
+    def stream_document(self, file_bytes: bytes, file_type: str) -> Iterator[Dict]:
+        """Document pipeline that yields its results as they become available
+        
+        Yields {'event': 'ocr_text', 'text': ...} as soon as OCR finishes,
+        then {'event': 'llava', 'text': ...} fragments of the cleaned text as
+        LLaVA generates them, then {'event': 'done', 'refined': ..., 'cached': ...}.
+        refined is False when Ollama was unavailable and the OCR text stands.
+        A failure ends the stream with {'event': 'error', 'detail': ...}.
+        """
+        try:
+            if not self.tesseract_available:
+                raise Exception("Tesseract OCR is not installed")
+            extracted_text = self.extract_text(file_bytes, file_type)
+        except Exception as e:
+            yield {'event': 'error', 'detail': str(e)}
+            return
+        yield {'event': 'ocr_text', 'text': extracted_text}
+        
+        key = self._cache_key(file_bytes, file_type, model=self.llava_model)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield {'event': 'llava', 'text': cached}
+            yield {'event': 'done', 'refined': True, 'cached': True}
+            return
+        
+        answer, sent = '', 0
+        try:
+            for fragment in self.ollama.generate_stream(self._llava_payload(extracted_text), timeout=180):
+                answer += fragment
+                # Hold back anything the final fence and whitespace stripping could still remove
+                stable = _stable_prefix(answer)
+                if len(stable) > sent:
+                    yield {'event': 'llava', 'text': stable[sent:]}
+                    sent = len(stable)
+        except OllamaUnavailable as e:
+            if sent:
+                yield {'event': 'error', 'detail': str(e)}
+            else:
+                yield {'event': 'done', 'refined': False, 'cached': False}
+            return
+        
+        cleaned = _strip_code_fence(answer)
+        if len(cleaned) > sent:
+            yield {'event': 'llava', 'text': cleaned[sent:]}
+        self.cache.put(key, cleaned)
+        yield {'event': 'done', 'refined': True, 'cached': False}
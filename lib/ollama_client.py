@@ -0,0 +1,191 @@
+"""
+Pooled Ollama HTTP client with cached health state and a circuit breaker
+One keep-alive requests.Session is reused for every call. Ollama's health
+is probed at most once per TTL instead of before every generation. When
+Ollama cannot be reached, or after repeated request failures, the circuit
+opens: callers are told immediately that Ollama is unavailable while a
+background thread probes until it answers again.
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+
+class OllamaUnavailable(Exception):
+    """Raised when Ollama is down, the circuit is open, or a request failed"""
+
+class OllamaClient:
+    """Ollama API client shared by every OCR request in the process
+
+    base_url defaults to $OLLAMA_URL, then http://localhost:11434, so the
+    client can be pointed at a stub server.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, health_ttl: float = 30.0,
+                 failure_threshold: int = 3, probe_interval: float = 15.0,
+                 probe_timeout: float = 2.0, pool_size: int = 8):
+        self.base_url = (base_url or os.environ.get('OLLAMA_URL', DEFAULT_OLLAMA_URL)).rstrip('/')
+        self.health_ttl = health_ttl
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self._healthy = None
+        self._checked_at = 0.0
+        self._failures = 0
+        self._open = False
+        self._prober = None
+        self._counters = {'requests': 0, 'failures': 0, 'short_circuited': 0, 'probes': 0, 'circuit_opened': 0}
+
+    def _probe(self) -> bool:
+        """One health check against /api/tags"""
+        with self._lock:
+            self._counters['probes'] += 1
+        try:
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=self.probe_timeout)
+            return response.status_code == 200
+        except requests.RequestException:
+            return False
+
+    def is_available(self) -> bool:
+        """Cached health status; only probes when the cached result is older than health_ttl"""
+        with self._lock:
+            if self._open:
+                self._counters['short_circuited'] += 1
+                return False
+            if self._healthy is not None and time.monotonic() - self._checked_at < self.health_ttl:
+                if not self._healthy:
+                    self._counters['short_circuited'] += 1
+                return self._healthy
+
+        healthy = self._probe()
+        with self._lock:
+            self._healthy = healthy
+            self._checked_at = time.monotonic()
+            if not healthy:
+                # Ollama is down: stop probing on user requests and let the
+                # background prober find out when it is back
+                self._counters['failures'] += 1
+                self._open_circuit()
+        return healthy
+
+    def _record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._healthy = True
+            self._checked_at = time.monotonic()
+
+    def _record_failure(self):
+        """Count a failed request; open the circuit once failure_threshold is reached in a row"""
+        with self._lock:
+            self._counters['failures'] += 1
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._open_circuit()
+
+    def _open_circuit(self):
+        """Short-circuit callers and start the background prober; call with _lock held"""
+        if self._open:
+            return
+        self._open = True
+        self._counters['circuit_opened'] += 1
+        self._prober = threading.Thread(target=self._probe_until_healthy, name='ollama-probe', daemon=True)
+        self._prober.start()
+
+    def _probe_until_healthy(self):
+        """Background thread: close the circuit once Ollama answers again"""
+        while True:
+            time.sleep(self.probe_interval)
+            if self._probe():
+                break
+        with self._lock:
+            self._open = False
+            self._healthy = True
+            self._checked_at = time.monotonic()
+            # Half-open: one more failure reopens the circuit straight away
+            self._failures = self.failure_threshold - 1
+            self._prober = None
+
+    def post(self, path: str, payload: dict, timeout: float, stream: bool = False) -> requests.Response:
+        """POST payload to the Ollama API; raises OllamaUnavailable instead of waiting on a dead server"""
+        if not self.is_available():
+            raise OllamaUnavailable(f"Ollama at {self.base_url} is unavailable")
+        with self._lock:
+            self._counters['requests'] += 1
+        try:
+            response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=timeout, stream=stream)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if isinstance(e, requests.ConnectionError):
+                # Ollama itself is down, not just this generation
+                with self._lock:
+                    self._counters['failures'] += 1
+                    self._healthy = False
+                    self._checked_at = time.monotonic()
+                    self._open_circuit()
+            else:
+                self._record_failure()
+            raise OllamaUnavailable(f"Ollama request failed: {e}")
+        self._record_success()
+        return response
+
+    def generate(self, payload: dict, timeout: float = 180) -> dict:
+        """Non-streaming /api/generate call, returning the decoded JSON body"""
+        response = self.post("/api/generate", dict(payload, stream=False), timeout)
+        try:
+            return response.json()
+        except ValueError as e:
+            self._record_failure()
+            raise OllamaUnavailable(f"Ollama returned invalid JSON: {e}")
+
+    def generate_stream(self, payload: dict, timeout: float = 180) -> Iterator[str]:
+        """Streaming /api/generate call, yielding response fragments as Ollama produces them
+
+        Ollama sends one JSON object per line; timeout applies between
+        lines rather than to the whole completion.
+        """
+        response = self.post("/api/generate", dict(payload, stream=True), timeout, stream=True)
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                try:
+                    message = json.loads(line)
+                except ValueError as e:
+                    self._record_failure()
+                    raise OllamaUnavailable(f"Ollama returned invalid JSON: {e}")
+                if 'error' in message:
+                    self._record_failure()
+                    raise OllamaUnavailable(f"Ollama error: {message['error']}")
+                yield message.get('response', '')
+                if message.get('done'):
+                    return
+        except requests.RequestException as e:
+            self._record_failure()
+            raise OllamaUnavailable(f"Ollama stream failed: {e}")
+        finally:
+            response.close()
+
+    def stats(self) -> dict:
+        """Circuit state and request counters"""
+        with self._lock:
+            return dict(
+                base_url=self.base_url,
+                healthy=self._healthy,
+                circuit_open=self._open,
+                consecutive_failures=self._failures,
+                **self._counters
+            )
@@ -0,0 +1,102 @@
+"""
+Measure per-worker memory of predictor processes with and without mmap loading
+Starts N workers that each load the model and serve a few predictions, then
+reads RSS, PSS and shared/private memory from /proc while they are all alive
+"""
+
+import os
+import sys
+import json
+import argparse
+import multiprocessing as mp
+
+def read_memory_stats():
+    """Memory counters for the current process in MiB (Linux /proc only)"""
+    stats = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(('VmRSS:', 'RssAnon:', 'RssFile:')):
+                key, value = line.split(':', 1)
+                stats[key] = int(value.split()[0]) / 1024
+
+    # smaps_rollup attributes shared pages proportionally (PSS)
+    if os.path.exists('/proc/self/smaps_rollup'):
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith(('Pss:', 'Shared_Clean:', 'Private_Clean:', 'Private_Dirty:')):
+                    key, value = line.split(':', 1)
+                    stats[key] = int(value.split()[0]) / 1024
+
+    return stats
+
+def worker(mmap, predictions, ready, done, results):
+    """Load the model, run some predictions, report memory, then wait"""
+    import numpy as np
+    from predict import load_model_and_data, predict_diseases_batch
+
+    model, symptom_names, symptom_mapping, diseases = load_model_and_data(mmap=mmap)
+
+    rng = np.random.default_rng(os.getpid())
+    symptom_lists = [
+        list(rng.choice(symptom_names, size=rng.integers(1, 8), replace=False))
+        for _ in range(predictions)
+    ]
+    predict_diseases_batch(symptom_lists, model, symptom_names, symptom_mapping, diseases)
+
+    # Wait until every worker has loaded so shared pages are counted once
+    ready.wait()
+    results.put(read_memory_stats())
+    done.wait()
+
+def measure(mmap, workers, predictions):
+    """Start the workers for one mode and return their memory stats"""
+    context = mp.get_context('spawn')
+    ready = context.Barrier(workers)
+    done = context.Event()
+    results = context.Queue()
+
+    processes = [
+        context.Process(target=worker, args=(mmap, predictions, ready, done, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        stats = [results.get(timeout=600) for _ in processes]
+    finally:
+        done.set()
+        for process in processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+    def mean(key):
+        values = [s[key] for s in stats if key in s]
+        return round(sum(values) / len(values), 1) if values else None
+
+    return {
+        'mode': 'mmap' if mmap else 'copy',
+        'workers': workers,
+        'rss_mib_per_worker': mean('VmRSS'),
+        'pss_mib_per_worker': mean('Pss'),
+        'rss_anon_mib_per_worker': mean('RssAnon'),
+        'rss_file_mib_per_worker': mean('RssFile'),
+        'shared_clean_mib_per_worker': mean('Shared_Clean'),
+        'private_mib_per_worker': round((mean('Private_Clean') or 0) + (mean('Private_Dirty') or 0), 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare predictor worker memory with and without mmap')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--predictions', type=int, default=200, help='predictions per worker before measuring')
+    args = parser.parse_args()
+
+    if not sys.platform.startswith('linux'):
+        raise SystemExit('This script reads /proc and only runs on Linux')
+
+    report = [measure(mmap, args.workers, args.predictions) for mmap in (False, True)]
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
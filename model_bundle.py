@@ -0,0 +1,159 @@
+"""
+Single-file model bundle shared by train_model.py and predict.py
+
+Layout:
+    8 bytes   magic b'SHBUNDLE'
+    4 bytes   little-endian uint32 header length
+    N bytes   UTF-8 JSON header
+    ...       raw array data, each array 64-byte aligned
+
+The header carries the format version, provenance (training data hash,
+sklearn version), the feature and class lists and, for every array, its
+dtype, shape and offset from the start of the data section. Arrays are
+stored uncompressed in C order so they can be memory-mapped read-only.
+"""
+
+import os
+import json
+import pickle
+import struct
+import tempfile
+import numpy as np
+
+MAGIC = b'SHBUNDLE'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+BUNDLE_PATH = 'model_bundle.bin'
+
+class BundleError(ValueError):
+    """Raised when a bundle is malformed or inconsistent with its metadata"""
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def write_bundle(path, header, arrays):
+    """Write header and arrays to path atomically
+
+    The file is written next to its destination and renamed into place, so
+    readers never see a partially written bundle.
+    """
+    header = dict(header, format_version=FORMAT_VERSION, arrays={})
+    arrays = {name: np.ascontiguousarray(array) if np.ndim(array) else np.asarray(array)
+              for name, array in arrays.items()}
+
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset
+        }
+        offset = _aligned(offset + array.nbytes)
+
+    header_bytes = json.dumps(header, default=str).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 4 + len(header_bytes))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.bundle-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header_bytes)))
+            f.write(header_bytes)
+            for name, array in arrays.items():
+                f.seek(data_start + header['arrays'][name]['offset'])
+                f.write(array.tobytes())
+            # Pad the final array so every extent lies inside the file
+            f.truncate(data_start + offset)
+        # mkstemp creates the file 0600; give the bundle normal file permissions
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp_path, 0o666 & ~umask)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+def read_header(path):
+    """Read and validate the JSON header without touching the array data"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise BundleError(f'{path} is not a model bundle')
+        try:
+            (header_length,) = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_length).decode('utf-8'))
+        except (struct.error, ValueError, UnicodeDecodeError) as e:
+            # Truncated or corrupt file: blame the bundle, not the caller
+            raise BundleError(f'{path} has a truncated or corrupt header: {e}') from e
+    if not isinstance(header, dict):
+        raise BundleError(f'{path} has a corrupt header')
+
+    if header.get('format_version') != FORMAT_VERSION:
+        raise BundleError(
+            f"Unsupported bundle format version {header.get('format_version')} "
+            f"(expected {FORMAT_VERSION})"
+        )
+
+    header['data_start'] = _aligned(len(MAGIC) + 4 + header_length)
+
+    file_size = os.path.getsize(path)
+    try:
+        for name, spec in header['arrays'].items():
+            nbytes = np.dtype(spec['dtype']).itemsize * int(np.prod(spec['shape']))
+            if header['data_start'] + spec['offset'] + nbytes > file_size:
+                raise BundleError(f'Array {name} extends past the end of {path}')
+    except (KeyError, TypeError, AttributeError) as e:
+        raise BundleError(f'{path} has a corrupt array table: {e!r}') from e
+
+    return header
+
+def _read_array(f, path, header, name, mmap):
+    spec = header['arrays'][name]
+    dtype = np.dtype(spec['dtype'])
+    shape = tuple(spec['shape'])
+    offset = header['data_start'] + spec['offset']
+    count = int(np.prod(shape))
+
+    if mmap and shape and count:
+        return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+
+    f.seek(offset)
+    return np.frombuffer(f.read(dtype.itemsize * count), dtype=dtype).reshape(shape)
+
+def load_arrays(path, header, prefix='', mmap=False):
+    """Load the arrays whose names start with prefix, with the prefix stripped
+
+    With mmap=True arrays are read-only memory maps of the bundle file;
+    otherwise they are copied into memory.
+    """
+    with open(path, 'rb') as f:
+        return {
+            name[len(prefix):]: _read_array(f, path, header, name, mmap)
+            for name in header['arrays']
+            if name.startswith(prefix)
+        }
+
+def load_array(path, header, name, mmap=False):
+    """Load a single array by its full name"""
+    if name not in header['arrays']:
+        raise BundleError(f'Bundle {path} has no array {name}')
+    with open(path, 'rb') as f:
+        return _read_array(f, path, header, name, mmap)
+
+def load_sklearn_model(path, header):
+    """Unpickle the fitted sklearn estimator stored in the bundle
+
+    Only training tools need this; importing sklearn is deferred until here.
+    """
+    return pickle.loads(load_array(path, header, 'sklearn/model').tobytes())
+
+def load_test_rows(path, header):
+    """Row indices of the training data held out from fitting, or None for older bundles
+
+    train_model.py records them so incremental runs and evaluation tools
+    reuse the split the forest was actually trained with.
+    """
+    if 'split/test_rows' not in header['arrays']:
+        return None
+    return load_array(path, header, 'split/test_rows')
@@ -1,64 +1,183 @@
 import { spawn } from 'child_process';
 import path from 'path';
 
+// A single long-running `predict.py --serve` process is shared by every
+// request so the model is loaded once instead of on every symptom check.
+let predictor = null;
+
+// Only the end of the child's stderr is kept, for the server log when it exits
+const STDERR_TAIL_BYTES = 16 * 1024;
+
+// Seconds a request may wait for an answer before it is failed with a 504
+const REQUEST_TIMEOUT_MS = parseFloat(process.env.PREDICT_REQUEST_TIMEOUT || '30') * 1000;
+
+function getPredictor() {
+  if (predictor) {
+    return predictor;
+  }
+
+  // PREDICT_WORKERS > 0 runs a pool of warm worker processes with a bounded
+  // queue; busy and timed-out requests come back with a `code` field.
+  // PREDICT_BACKEND (forest, bernoulli_nb, logistic) is read by predict.py
+  // from the inherited environment.
+  const args = ['predict.py', '--serve'];
+  const workers = parseInt(process.env.PREDICT_WORKERS || '0', 10);
+  if (workers > 0) {
+    args.push('--workers', String(workers));
+    if (process.env.PREDICT_QUEUE_SIZE) {
+      args.push('--queue-size', process.env.PREDICT_QUEUE_SIZE);
+    }
+    if (process.env.PREDICT_TIMEOUT) {
+      args.push('--timeout', process.env.PREDICT_TIMEOUT);
+    }
+  }
+
+  const child = spawn('python', args, {
+    stdio: ['pipe', 'pipe', 'pipe']
+  });
+
+  const state = {
+    child,
+    nextId: 1,
+    workers,
+    pending: new Map(),
+    buffer: '',
+    stderr: ''
+  };
+
+  child.stdout.on('data', (data) => {
+    state.buffer += data.toString();
+
+    let newline;
+    while ((newline = state.buffer.indexOf('\n')) !== -1) {
+      const line = state.buffer.slice(0, newline);
+      state.buffer = state.buffer.slice(newline + 1);
+      if (!line.trim()) {
+        continue;
+      }
+
+      let response;
+      try {
+        response = JSON.parse(line);
+      } catch (parseError) {
+        console.error('JSON parse error:', parseError, line);
+        continue;
+      }
+
+      const request = state.pending.get(response.id);
+      if (request) {
+        state.pending.delete(response.id);
+        clearTimeout(request.timer);
+        request.resolve(response);
+      }
+    }
+  });
+
+  child.stderr.on('data', (data) => {
+    state.stderr = (state.stderr + data.toString()).slice(-STDERR_TAIL_BYTES);
+  });
+
+  const fail = (message) => {
+    if (predictor === state) {
+      predictor = null;
+    }
+    if (state.pending.size || state.stderr) {
+      // The stderr tail is process-wide, so it goes to the server log only
+      console.error(message, state.stderr);
+    }
+    for (const request of state.pending.values()) {
+      clearTimeout(request.timer);
+      request.resolve({ error: message });
+    }
+    state.pending.clear();
+  };
+
+  child.on('error', (error) => fail(`Failed to start predictor: ${error.message}`));
+  child.on('close', (code) => fail(`Predictor exited with code ${code}`));
+  // Writing to a child that has just exited raises EPIPE here instead of crashing the server
+  child.stdin.on('error', (error) => {
+    fail(`Predictor input closed: ${error.message}`);
+    child.kill();
+  });
+
+  predictor = state;
+  return state;
+}
+
+function requestPrediction(symptoms) {
+  return new Promise((resolve, reject) => {
+    const state = getPredictor();
+    const id = state.nextId++;
+    const timer = setTimeout(() => {
+      state.pending.delete(id);
+      const error = new Error('Prediction timed out');
+      error.code = 'timeout';
+      reject(error);
+      if (!state.workers) {
+        // A single predictor answers in order, so it is stuck on this request;
+        // replace it rather than letting every later request time out too
+        if (predictor === state) {
+          predictor = null;
+        }
+        state.child.kill();
+      }
+    }, REQUEST_TIMEOUT_MS);
+    state.pending.set(id, { resolve, timer });
+    state.child.stdin.write(JSON.stringify({ id, symptoms }) + '\n');
+  });
+}
+
 export default async function handler(req, res) {
   if (req.method !== 'POST') {
     return res.status(405).json({ error: 'Method not allowed' });
   }
 
   try {
-    const { symptoms } = req.body;
+    const { symptoms, includeResolution } = req.body;
 
     if (!symptoms || !Array.isArray(symptoms)) {
       return res.status(400).json({ error: 'Symptoms array is required' });
     }
 
-    // Call Python script to make prediction
-    const pythonProcess = spawn('python', ['predict.py'], {
-      stdio: ['pipe', 'pipe', 'pipe']
-    });
+    // Ask the warm Python predictor for a prediction
+    const response = await requestPrediction(symptoms);
 
-    // Send symptoms to Python script
-    pythonProcess.stdin.write(JSON.stringify(symptoms));
-    pythonProcess.stdin.end();
-
-    let result = '';
-    let error = '';
+    if (response.code === 'busy') {
+      return res.status(503).json({ error: 'Prediction service busy, please retry' });
+    }
 
-    pythonProcess.stdout.on('data', (data) => {
-      result += data.toString();
-    });
+    if (response.code === 'timeout') {
+      return res.status(504).json({ error: 'Prediction timed out' });
+    }
 
-    pythonProcess.stderr.on('data', (data) => {
-      error += data.toString();
-    });
+    if (response.error) {
+      console.error('Python script error:', response.error);
+      return res.status(500).json({
+        error: 'Prediction failed',
+        details: response.error
+      });
+    }
 
-    pythonProcess.on('close', (code) => {
-      if (code !== 0) {
-        console.error('Python script error:', error);
-        return res.status(500).json({ 
-          error: 'Prediction failed',
-          details: error 
-        });
-      }
+    // The bare results array stays the default response. With
+    // includeResolution the body is { results, resolution }, where resolution
+    // lists symptoms that were fuzzy-matched or dropped (null if none were).
+    if (includeResolution) {
+      return res.status(200).json({
+        results: response.results,
+        resolution: response.resolution || null
+      });
+    }
 
-      try {
-        const predictions = JSON.parse(result);
-        res.status(200).json(predictions);
-      } catch (parseError) {
-        console.error('JSON parse error:', parseError);
-        res.status(500).json({ 
-          error: 'Failed to parse prediction results',
-          details: result 
-        });
-      }
-    });
+    res.status(200).json(response.results);
 
   } catch (error) {
+    if (error.code === 'timeout') {
+      return res.status(504).json({ error: 'Prediction timed out' });
+    }
     console.error('API error:', error);
-    res.status(500).json({ 
+    res.status(500).json({
       error: 'Internal server error',
-      details: error.message 
+      details: error.message
     });
   }
-} 
\ No newline at end of file
+}
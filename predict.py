@@ -1,84 +1,1033 @@
 import sys
 import json
-import joblib
+import argparse
+import hashlib
+import os
+import socketserver
+import threading
+import time
+import warnings
+from collections import OrderedDict
 import numpy as np
 
-def load_model_and_data():
-    """Load the trained model and metadata"""
-    try:
-        # Load the trained model
-        model = joblib.load('trained_model.pkl')
+from model_bundle import BUNDLE_PATH, BundleError, read_header, load_arrays, load_sklearn_model
+from prediction_pool import PredictionPool, PoolFullError, PredictionTimeout
+from symptom_resolver import SymptomResolver
+
+class StageTimer:
+    """Accumulates wall time per named stage of one request
+    
+    mark(stage) charges the time since the previous mark (or creation) to
+    stage, so call sites only need one call at the end of each stage.
+    """
+    
+    __slots__ = ('stages', '_last')
+    
+    def __init__(self):
+        self.stages = {}
+        self._last = time.perf_counter()
+    
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+class _NullTimer:
+    """Stand-in for StageTimer when timing output is disabled"""
+    
+    __slots__ = ()
+    
+    def mark(self, stage):
+        pass
+
+NULL_TIMER = _NullTimer()
+
+class TimingSink:
+    """Writes per-request timing records as JSON lines to stderr or a file"""
+    
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def emit(self, event, timer, **fields):
+        stages = {stage: round(ms, 3) for stage, ms in timer.stages.items()}
+        record = dict(event=event, pid=os.getpid(), stages_ms=stages,
+                      total_ms=round(sum(timer.stages.values()), 3), **fields)
+        line = json.dumps(record) + '\n'
+        with self._lock:
+            if self.path:
+                with open(self.path, 'a') as f:
+                    f.write(line)
+            else:
+                sys.stderr.write(line)
+                sys.stderr.flush()
+
+# Set by configure_timings(); None keeps every timer a no-op
+timing_sink = None
+
+def configure_timings(enabled=None, metrics_file=None):
+    """Enable timing output from arguments, falling back to the environment
+    
+    PREDICT_TIMINGS=1 writes records to stderr and PREDICT_METRICS_FILE
+    appends them to a file instead. The environment is updated too, so
+    worker processes started afterwards inherit the setting.
+    """
+    global timing_sink
+    
+    if enabled:
+        os.environ['PREDICT_TIMINGS'] = '1'
+    if metrics_file:
+        os.environ['PREDICT_METRICS_FILE'] = metrics_file
+    
+    metrics_file = os.environ.get('PREDICT_METRICS_FILE')
+    if metrics_file or os.environ.get('PREDICT_TIMINGS') == '1':
+        timing_sink = TimingSink(metrics_file)
+    else:
+        timing_sink = None
+
+def new_timer():
+    """A StageTimer when timing output is enabled, otherwise NULL_TIMER"""
+    return StageTimer() if timing_sink is not None else NULL_TIMER
+
+def emit_timings(event, timer, **fields):
+    """Write timer's record if timing output is enabled"""
+    if timing_sink is not None and timer is not NULL_TIMER:
+        timing_sink.emit(event, timer, **fields)
+
+class CompiledForest:
+    """Array-based RandomForest inference over the arrays from train_model.compile_forest
+    
+    Every tree is walked at once: each step gathers the split feature of the
+    current node of every (row, tree) pair and moves it to the left or right
+    child. Leaves are stored pointing back to themselves, so pairs that
+    finished early can stay in the working set; it is only compacted every
+    few steps.
+    
+    Leaf distributions are either a dense (leaves, classes) table or, for
+    bundles written by compact_model.py, a sparse CSR-style table of
+    (leaf_ptr, leaf_classes, leaf_probs) holding only non-zero entries.
+    """
+    
+    # Batches up to this many rows sum their leaves with a single gather
+    SMALL_BATCH = 16
+    # Rows walked together, sized so the per-pair arrays stay in cache
+    APPLY_CHUNK = 256
+    # Steps between dropping finished (row, tree) pairs from the working set
+    COMPACT_EVERY = 8
+    # Batches at least this large are scored by the sklearn estimator, when
+    # the caller supplies one, since its threaded C traversal wins there
+    LARGE_BATCH = 1000
+    
+    def __init__(self, arrays, estimator_loader=None):
+        self._estimator_loader = estimator_loader
+        self._estimator = None
+        self._estimator_lock = threading.Lock()
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        # Interleaved (left, right) pairs so one gather picks the next node
+        self.children = arrays['children'].reshape(-1)
+        self.leaf_index = arrays['leaf_index']
+        self.leaf_values = arrays.get('leaf_values')
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        self.n_features_in_ = int(arrays['n_features'])
+        if self.leaf_values is not None:
+            self.n_classes = self.leaf_values.shape[1]
+        else:
+            self.leaf_ptr = arrays['leaf_ptr']
+            self.leaf_classes = arrays['leaf_classes']
+            self.leaf_probs = arrays['leaf_probs']
+            self.n_classes = int(arrays['n_classes'])
         
-        # Load symptom names and mapping
-        with open('symptom_names.json', 'r') as f:
-            symptom_names = json.load(f)
+        self.is_split = self.leaf_index < 0
+        # Symptom vectors are 0/1; when every split threshold lies between
+        # them, the feature value itself says whether to go right
+        split_thresholds = self.threshold[self.is_split]
+        self.binary_splits = bool(np.all((split_thresholds >= 0) & (split_thresholds < 1)))
+    
+    def apply(self, X):
+        """Return the global leaf node reached in every tree, shape (rows, trees)"""
+        X = np.asarray(X, dtype=np.float32)
+        if self.binary_splits and np.array_equal(X, X.astype(bool)):
+            go_right, threshold = X.astype(np.intp), None
+        else:
+            go_right, threshold = X, self.threshold
         
-        with open('symptom_mapping.json', 'r') as f:
-            symptom_mapping = json.load(f)
+        return np.vstack([
+            self._apply_chunk(go_right[start:start + self.APPLY_CHUNK], threshold)
+            for start in range(0, len(X), self.APPLY_CHUNK)
+        ]) if len(X) else np.empty((0, len(self.roots)), dtype=np.intp)
+    
+    def _apply_chunk(self, X, threshold):
+        """apply() for one chunk of rows; threshold None means X holds the go-right bits"""
+        n_rows, n_trees = len(X), len(self.roots)
+        flat_X = X.ravel()
+        nodes = np.tile(self.roots.astype(np.intp), n_rows)
+        row_offsets = np.repeat(np.arange(n_rows, dtype=np.intp) * X.shape[1], n_trees)
         
-        with open('diseases.json', 'r') as f:
-            diseases = json.load(f)
+        active = np.arange(len(nodes))
+        current = nodes.copy()
+        for step in range(1, self.max_depth + 1):
+            if threshold is None:
+                go_right = flat_X[row_offsets + self.feature[current]]
+            else:
+                go_right = flat_X[row_offsets + self.feature[current]] > threshold[current]
+            current = self.children[2 * current + go_right]
+            if step % self.COMPACT_EVERY == 0 or step == self.max_depth:
+                nodes[active] = current
+                still_split = self.is_split[current]
+                active, current, row_offsets = active[still_split], current[still_split], row_offsets[still_split]
+                if not len(active):
+                    break
         
-        return model, symptom_names, symptom_mapping, diseases
-    except FileNotFoundError as e:
-        print(json.dumps({'error': f'Model files not found: {e}'}))
-        sys.exit(1)
+        return nodes.reshape(n_rows, n_trees)
+    
+    def predict_proba(self, X):
+        """Average the leaf class distributions of every tree, like sklearn"""
+        if self._estimator_loader is not None and len(X) >= self.LARGE_BATCH:
+            return self._estimator_proba(X)
+        leaves = self.leaf_index[self.apply(X)]
+        n_rows, n_trees = leaves.shape
+        
+        if self.leaf_values is None:
+            proba = self._sparse_leaf_sum(leaves)
+        elif n_rows <= self.SMALL_BATCH:
+            proba = self.leaf_values[leaves].sum(axis=1)
+        else:
+            # Accumulate tree by tree to avoid a (rows, trees, classes) temporary
+            proba = np.zeros((n_rows, self.n_classes))
+            for tree in range(n_trees):
+                proba += self.leaf_values[leaves[:, tree]]
+        
+        return proba / n_trees
+    
+    def _estimator_proba(self, X):
+        """predict_proba of the sklearn estimator, unpickled on the first large batch"""
+        with self._estimator_lock:
+            if self._estimator is None:
+                self._estimator = self._estimator_loader()
+        with warnings.catch_warnings():
+            # Fitted on a DataFrame; the plain array has the same column order
+            warnings.filterwarnings('ignore', message='X does not have valid feature names')
+            return self._estimator.predict_proba(np.asarray(X, dtype=np.float32))
+    
+    def _sparse_leaf_sum(self, leaves):
+        """Sum the sparse leaf distributions of every row with one bincount"""
+        n_rows, n_trees = leaves.shape
+        flat = leaves.ravel()
+        starts = self.leaf_ptr[flat]
+        lengths = self.leaf_ptr[flat + 1] - starts
+        
+        # Position of every stored entry of every selected leaf
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - offsets, lengths) + np.arange(int(lengths.sum()))
+        rows = np.repeat(np.arange(n_rows).repeat(n_trees), lengths)
+        
+        bins = rows * self.n_classes + self.leaf_classes[positions]
+        proba = np.bincount(bins, weights=self.leaf_probs[positions], minlength=n_rows * self.n_classes)
+        return proba.reshape(n_rows, self.n_classes)
 
-def predict_diseases(symptoms, model, symptom_names, symptom_mapping, diseases):
-    """Make predictions based on selected symptoms"""
+class LinearModel:
+    """Bernoulli naive Bayes or multinomial logistic scoring as one matrix multiply
+    
+    train_model.py folds either model into weights (features, classes) and
+    bias (classes,) so that softmax(X @ weights + bias) equals the sklearn
+    model's predict_proba for binary X.
+    """
+    
+    def __init__(self, arrays):
+        self.weights = arrays['weights']
+        self.bias = arrays['bias']
+        self.n_features_in_, self.n_classes = self.weights.shape
+    
+    def predict_proba(self, X):
+        scores = np.asarray(X, dtype=self.weights.dtype) @ self.weights + self.bias
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        return scores / scores.sum(axis=1, keepdims=True)
+
+# Model backends a bundle can hold; 'forest' is always present
+BACKENDS = ('forest', 'bernoulli_nb', 'logistic')
+
+def resolve_backend(backend=None):
+    """The requested backend, else $PREDICT_BACKEND, else the random forest"""
+    backend = backend or os.environ.get('PREDICT_BACKEND') or 'forest'
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r} (expected one of {', '.join(BACKENDS)})")
+    return backend
+
+_artifact_hashes = {}
+
+def artifact_hash(path):
+    """SHA-256 of a model artifact, recomputed only when its size or mtime changes"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    
+    signature = (stat.st_size, stat.st_mtime_ns)
+    cached = _artifact_hashes.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    _artifact_hashes[path] = (signature, digest.hexdigest())
+    return digest.hexdigest()
+
+def check_bundle_consistency(header, model):
+    """Fail fast if the model arrays and the bundle metadata disagree"""
+    symptom_names = header['symptom_names']
+    diseases = header['diseases']
+    
+    if len(set(symptom_names)) != len(symptom_names):
+        raise BundleError('Duplicate symptom names in bundle')
+    if not header['n_features'] == len(symptom_names) == model.n_features_in_:
+        raise BundleError(
+            f"Feature count mismatch: header {header['n_features']}, "
+            f"symptom names {len(symptom_names)}, model {model.n_features_in_}"
+        )
+    if not header['n_classes'] == len(diseases) == model.n_classes:
+        raise BundleError(
+            f"Class count mismatch: header {header['n_classes']}, "
+            f"diseases {len(diseases)}, model {model.n_classes}"
+        )
+
+def forest_uses_estimator(header):
+    """Whether large forest batches are scored by the bundle's pickled sklearn estimator
+    
+    Only when the forest arrays are its exact compile; compact_model.py
+    rewrites them.
+    """
+    return 'sklearn/model' in header['arrays'] and 'compaction' not in header
+
+def load_backend(path, header, backend, mmap=False):
+    """Build the model object for one backend stored in the bundle"""
+    if backend == 'forest':
+        estimator_loader = None
+        if forest_uses_estimator(header):
+            estimator_loader = lambda: load_sklearn_model(path, header)
+        return CompiledForest(load_arrays(path, header, prefix='forest/', mmap=mmap), estimator_loader)
+    arrays = load_arrays(path, header, prefix=f'backends/{backend}/', mmap=mmap)
+    if not arrays:
+        raise BundleError(f'no {backend} backend; train it with train_model.py --backends {backend}')
+    return LinearModel(arrays)
+
+def load_model_and_data(mmap=False, path=BUNDLE_PATH, timer=NULL_TIMER, backend=None):
+    """Load the trained model and metadata from the model bundle
+    
+    Only the JSON header is parsed eagerly; the symptom mapping is derived
+    from the symptom names. With mmap=True the model arrays are
+    memory-mapped read-only instead of copied into the process, so several
+    workers share one copy. backend picks the model (see resolve_backend).
+    Raises BundleError if the bundle is missing or unreadable.
+    """
     try:
-        # Create feature vector (all zeros initially)
-        features = np.zeros(len(symptom_names))
+        header = read_header(path)
+        timer.mark('read_header')
+        model = load_backend(path, header, resolve_backend(backend), mmap=mmap)
+        check_bundle_consistency(header, model)
+        timer.mark('load_arrays')
         
-        # Set selected symptoms to 1
+        symptom_names = header['symptom_names']
+        diseases = header['diseases']
+        symptom_mapping = {name: i for i, name in enumerate(symptom_names)}
+        timer.mark('build_mapping')
+        
+        return model, symptom_names, symptom_mapping, diseases
+    except FileNotFoundError as e:
+        raise BundleError(f'Model files not found: {e}') from e
+    except (BundleError, KeyError) as e:
+        raise BundleError(f'Invalid model bundle: {e}') from e
+
+class PredictionCache:
+    """Bounded LRU cache of top-k predictions keyed by canonical symptom set
+    
+    Keys are the sorted, deduplicated feature indices of the known symptoms in
+    a request (plus top_k), so ["cough", "fever", "cough"] and ["fever",
+    "cough"] share an entry. The cache is bound to a model artifact hash and
+    drops every entry when a different hash is bound.
+    """
+    
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.model_hash = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def bind(self, model_hash):
+        """Attach the cache to a model, clearing it if the model changed"""
+        with self._lock:
+            if model_hash != self.model_hash:
+                self._entries.clear()
+                self.model_hash = model_hash
+    
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entry"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def stats(self):
+        """Hit/miss counters and occupancy, for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'model_hash': self.model_hash
+            }
+
+def canonical_symptom_key(symptoms, symptom_mapping):
+    """Sorted, deduplicated feature indices of the known symptoms"""
+    return tuple(sorted({symptom_mapping[symptom] for symptom in symptoms if symptom in symptom_mapping}))
+
+def build_feature_matrix(symptom_lists, symptom_names, symptom_mapping):
+    """Build one binary feature row per symptom list"""
+    features = np.zeros((len(symptom_lists), len(symptom_names)))
+    
+    for row, symptoms in enumerate(symptom_lists):
         for symptom in symptoms:
             if symptom in symptom_mapping:
-                features[symptom_mapping[symptom]] = 1
-        
-        # Make prediction
-        prediction_proba = model.predict_proba([features])[0]
-        
-        # Get top 5 predictions with probabilities
-        top_indices = np.argsort(prediction_proba)[::-1][:5]
-        
-        results = []
-        for idx in top_indices:
-            if prediction_proba[idx] > 0.01:  # Only include if probability > 1%
-                results.append({
-                    'condition': diseases[idx],
-                    'probability': round(prediction_proba[idx] * 100, 1),
-                    'severity': 'moderate',  # Default severity
-                    'description': f'Possible {diseases[idx]} based on symptoms',
-                    'symptoms': symptoms,
-                    'recommendations': [
-                        'Consult with a healthcare provider for proper diagnosis',
-                        'Monitor symptoms for any changes',
-                        'Keep track of symptom severity and duration'
-                    ],
-                    'whenToSeekCare': 'If symptoms persist or worsen, seek medical attention'
-                })
-        
-        return results
+                features[row, symptom_mapping[symptom]] = 1
+    
+    return features
+
+def top_k_indices(prediction_proba, top_k):
+    """Return the indices of the top_k probabilities of each row, best first"""
+    top_k = min(top_k, prediction_proba.shape[1])
+    if top_k < prediction_proba.shape[1]:
+        # Partition first so only top_k columns per row need a full sort
+        candidates = np.argpartition(-prediction_proba, top_k - 1, axis=1)[:, :top_k]
+    else:
+        candidates = np.tile(np.arange(prediction_proba.shape[1]), (len(prediction_proba), 1))
+    
+    candidate_proba = np.take_along_axis(prediction_proba, candidates, axis=1)
+    order = np.argsort(-candidate_proba, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+def format_predictions(top_indices, top_proba, symptoms, diseases):
+    """Turn the top-k classes of one row into the API result list"""
+    results = []
+    for idx, probability in zip(top_indices, top_proba):
+        if probability > 0.01:  # Only include if probability > 1%
+            results.append({
+                'condition': diseases[idx],
+                'probability': round(float(probability) * 100, 1),
+                'severity': 'moderate',  # Default severity
+                'description': f'Possible {diseases[idx]} based on symptoms',
+                'symptoms': symptoms,
+                'recommendations': [
+                    'Consult with a healthcare provider for proper diagnosis',
+                    'Monitor symptoms for any changes',
+                    'Keep track of symptom severity and duration'
+                ],
+                'whenToSeekCare': 'If symptoms persist or worsen, seek medical attention'
+            })
+    
+    return results
+
+def top_k_predictions(symptom_lists, model, symptom_names, symptom_mapping, top_k=5, cache=None,
+                      timer=NULL_TIMER):
+    """(class indices, probabilities) of the top_k diseases for every symptom list
+    
+    With a PredictionCache, rows whose canonical symptom set is cached skip the
+    model and only the remaining rows are scored. timer receives the
+    cache_lookup, features, predict_proba and topk stages.
+    """
+    top = [None] * len(symptom_lists)
+    keys = [None] * len(symptom_lists)
+    if cache is not None:
+        for row, symptoms in enumerate(symptom_lists):
+            keys[row] = (canonical_symptom_key(symptoms, symptom_mapping), top_k)
+            top[row] = cache.get(keys[row])
+        timer.mark('cache_lookup')
+    
+    missing = [row for row, entry in enumerate(top) if entry is None]
+    if missing:
+        features = build_feature_matrix([symptom_lists[row] for row in missing], symptom_names, symptom_mapping)
+        timer.mark('features')
+        prediction_proba = model.predict_proba(features)
+        timer.mark('predict_proba')
+        top_indices = top_k_indices(prediction_proba, top_k)
+        top_proba = np.take_along_axis(prediction_proba, top_indices, axis=1)
+        timer.mark('topk')
+        
+        for position, row in enumerate(missing):
+            top[row] = (top_indices[position], top_proba[position])
+            if cache is not None:
+                cache.put(keys[row], top[row])
+    
+    return top
+
+def predict_diseases_batch(symptom_lists, model, symptom_names, symptom_mapping, diseases, top_k=5,
+                           cache=None, timer=NULL_TIMER, input_lists=None):
+    """Make predictions for many symptom lists with a single predict_proba call
+    
+    Each result echoes its row of input_lists (the symptoms as the caller
+    sent them, before resolution) or, by default, of symptom_lists. See
+    top_k_predictions for caching; timer additionally receives the format
+    stage.
+    """
+    if not symptom_lists:
+        return []
+    
+    top = top_k_predictions(symptom_lists, model, symptom_names, symptom_mapping, top_k=top_k, cache=cache,
+                            timer=timer)
+    if input_lists is None:
+        input_lists = symptom_lists
+    results = [
+        format_predictions(top[row][0], top[row][1], symptoms, diseases)
+        for row, symptoms in enumerate(input_lists)
+    ]
+    timer.mark('format')
+    return results
+
+def predict_diseases(symptoms, model, symptom_names, symptom_mapping, diseases, cache=None, timer=NULL_TIMER):
+    """Make predictions based on selected symptoms"""
+    # Get top 5 predictions with probabilities
+    return predict_diseases_batch([symptoms], model, symptom_names, symptom_mapping, diseases,
+                                  cache=cache, timer=timer)[0]
+
+def load_symptom_index(path=BUNDLE_PATH, mmap=False):
+    """Load the next-symptom index written by train_model.py, or None if the bundle has none
+    
+    The index holds frequency, the (diseases, symptoms) fraction of each
+    disease's training rows showing each symptom in model class order, and
+    category, each symptom's position in the categories list.
+    """
+    header = read_header(path)
+    arrays = load_arrays(path, header, prefix='symptom_index/', mmap=mmap)
+    if not arrays:
+        return None
+    arrays['categories'] = header['symptom_index']['categories']
+    return arrays
+
+def _conditional_entropy(joint):
+    """Sum over symptoms' outcomes of P(outcome) * H(disease | outcome), per column"""
+    marginal = joint.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = joint * np.log2(joint / marginal)
+    return -np.nansum(terms, axis=0)
+
+def suggest_symptoms(symptoms, top_indices, top_proba, symptom_index, symptom_names, symptom_mapping, top_n=5):
+    """Most discriminating unselected symptoms to ask about next
+    
+    The top predicted diseases, renormalized, are the current belief. Each
+    unselected symptom is scored by the expected information gain (in bits)
+    of learning whether it is present, using the per-disease symptom
+    frequencies; the top_n are returned, best first.
+    """
+    weights = np.asarray(top_proba, dtype=np.float64)
+    if weights.sum() <= 0:
+        return []
+    weights = weights / weights.sum()
+    
+    frequency = np.asarray(symptom_index['frequency'][np.asarray(top_indices)], dtype=np.float64)
+    present = weights[:, None] * frequency
+    absent = weights[:, None] - present
+    prior_entropy = -np.sum(weights[weights > 0] * np.log2(weights[weights > 0]))
+    gain = prior_entropy - _conditional_entropy(present) - _conditional_entropy(absent)
+    
+    selected = [symptom_mapping[symptom] for symptom in symptoms if symptom in symptom_mapping]
+    gain[selected] = -np.inf
+    
+    top_n = min(top_n, len(gain))
+    best = top_k_indices(gain[None, :], top_n)[0]
+    categories = symptom_index['categories']
+    return [
+        {
+            'symptom': symptom_names[idx],
+            'category': categories[symptom_index['category'][idx]],
+            'information_gain': round(float(gain[idx]), 4),
+            'probability': round(float(present[:, idx].sum()) * 100, 1),
+        }
+        for idx in best
+        if gain[idx] > 0
+    ]
+
+class Predictor:
+    """A loaded model with its result cache, for long-running callers
+    
+    refresh() re-hashes the model artifact (only when its mtime or size
+    changed) and reloads the model if the content differs, which also
+    invalidates the cache. Input symptoms go through a SymptomResolver, so
+    case, spacing and small spelling differences still reach the model.
+    
+    A reload that fails keeps the current model and cache serving: the
+    error is logged to stderr and kept in reload_error (shown by stats()),
+    requests are answered by the previous model, and the same broken
+    artifact is not retried until it changes again.
+    """
+    
+    def __init__(self, cache_size=1024, mmap=False, backend=None, path=BUNDLE_PATH):
+        self.cache = PredictionCache(cache_size) if cache_size > 0 else None
+        self.path = path
+        self.mmap = mmap
+        self.backend = resolve_backend(backend)
+        self.reload_error = None
+        self._failed_hash = None
+        self._lock = threading.Lock()
+        self.load()
+    
+    def load(self):
+        """Load the model and bind the cache to its artifact hash
+        
+        Everything is loaded before any attribute is replaced, so a
+        BundleError leaves the previous model in place.
+        """
+        timer = new_timer()
+        # Hash first: if the file changes during the load, the next refresh sees it
+        model_hash = artifact_hash(self.path)
+        timer.mark('hash_artifact')
+        model, symptom_names, symptom_mapping, diseases = load_model_and_data(
+            mmap=self.mmap, path=self.path, timer=timer, backend=self.backend)
+        symptom_index = load_symptom_index(path=self.path, mmap=self.mmap)
+        timer.mark('load_symptom_index')
+        resolver = SymptomResolver(symptom_names)
+        timer.mark('build_resolver')
+        
+        self.model, self.symptom_names, self.symptom_mapping, self.diseases = (
+            model, symptom_names, symptom_mapping, diseases)
+        self.symptom_index = symptom_index
+        self.resolver = resolver
+        self.model_hash = model_hash
+        if self.cache is not None:
+            self.cache.bind(self.model_hash)
+        emit_timings('load', timer, mmap=self.mmap, backend=self.backend)
+    
+    def _is_current(self, model_hash):
+        if model_hash == self.model_hash:
+            # The loaded artifact is back in place after a failed reload
+            self.reload_error = None
+            return True
+        return self.reload_error is not None and model_hash == self._failed_hash
+    
+    def refresh(self):
+        """Reload the model if its artifact changed on disk
+        
+        If the changed artifact cannot be loaded, the error is logged and
+        recorded in reload_error and the previous model stays in use.
+        """
+        if self._is_current(artifact_hash(self.path)):
+            return
+        with self._lock:
+            model_hash = artifact_hash(self.path)
+            if self._is_current(model_hash):
+                return
+            try:
+                self.load()
+            except Exception as e:
+                self._failed_hash = model_hash
+                self.reload_error = str(e)
+                print(json.dumps({'error': f'Model reload failed, still serving the previous model: {e}'}),
+                      file=sys.stderr)
+                return
+            self.reload_error = None
+    
+    def resolve(self, symptom_lists, timer=NULL_TIMER):
+        """Resolve every symptom list; returns (resolved lists, resolution reports)"""
+        resolved = [self.resolver.resolve(symptoms) for symptoms in symptom_lists]
+        timer.mark('resolve')
+        return [names for names, _ in resolved], [report for _, report in resolved]
+    
+    def predict_batch_with_resolution(self, symptom_lists, top_k=5, timer=NULL_TIMER):
+        """predict_batch plus the resolution report (or None) of every row"""
+        resolved, reports = self.resolve(symptom_lists, timer=timer)
+        results = predict_diseases_batch(resolved, self.model, self.symptom_names, self.symptom_mapping,
+                                         self.diseases, top_k=top_k, cache=self.cache, timer=timer,
+                                         input_lists=symptom_lists)
+        return results, reports
+    
+    def predict_batch(self, symptom_lists, top_k=5, timer=NULL_TIMER):
+        """predict_diseases_batch against the loaded model and cache"""
+        return self.predict_batch_with_resolution(symptom_lists, top_k=top_k, timer=timer)[0]
+    
+    def predict_with_resolution(self, symptoms, timer=NULL_TIMER):
+        """predict() plus the resolution report, or None if every symptom matched"""
+        results, reports = self.predict_batch_with_resolution([symptoms], timer=timer)
+        return results[0], reports[0]
+    
+    def predict(self, symptoms, timer=NULL_TIMER):
+        """predict_diseases against the loaded model and cache"""
+        return self.predict_with_resolution(symptoms, timer=timer)[0]
+    
+    def suggest(self, symptoms, top_k=10, top_n=5, timer=NULL_TIMER):
+        """suggest_symptoms for symptoms against their top_k predicted diseases"""
+        if self.symptom_index is None:
+            raise ValueError('Model bundle has no symptom index; retrain with train_model.py')
+        symptoms = self.resolve([symptoms], timer=timer)[0][0]
+        top_indices, top_proba = top_k_predictions([symptoms], self.model, self.symptom_names, self.symptom_mapping,
+                                                   top_k=top_k, cache=self.cache, timer=timer)[0]
+        suggestions = suggest_symptoms(symptoms, top_indices, top_proba, self.symptom_index, self.symptom_names,
+                                       self.symptom_mapping, top_n=top_n)
+        timer.mark('suggest')
+        return suggestions
+    
+    def stats(self):
+        """Cache counters (when caching is enabled), the resolver's under 'resolver' and any reload_error"""
+        stats = self.cache.stats() if self.cache is not None else {}
+        stats['resolver'] = self.resolver.stats()
+        stats['reload_error'] = self.reload_error
+        return stats
+
+def parse_symptom_request(request):
+    """Split a decoded request into (id, symptoms, error)
+    
+    A request is either a bare symptoms array or an object of the form
+    {"id": ..., "symptoms": [...]}. When symptoms is missing or holds
+    anything but strings, it is returned as None with an error message.
+    """
+    request_id, symptoms = None, request
+    if isinstance(request, dict):
+        request_id, symptoms = request.get('id'), request.get('symptoms')
+    if not isinstance(symptoms, list):
+        return request_id, None, 'Symptoms array is required'
+    if not all(isinstance(symptom, str) for symptom in symptoms):
+        return request_id, None, 'Symptoms must be strings'
+    return request_id, symptoms, None
+
+def decode_request(line):
+    """Decode one request line into (request_id, op, symptoms, error)
+    
+    op is 'stats' for {"op": "stats"}, 'suggest' for {"op": "suggest",
+    "symptoms": [...]} and 'predict' otherwise. error is set, and symptoms is
+    None, when the line is not a valid request.
+    """
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError:
+        return None, None, None, 'Invalid JSON input'
+    
+    request_id, symptoms, error = parse_symptom_request(request)
+    if isinstance(request, dict) and request.get('op') == 'stats':
+        return request_id, 'stats', None, None
+    op = 'suggest' if isinstance(request, dict) and request.get('op') == 'suggest' else 'predict'
+    return request_id, op, symptoms, error
+
+def handle_request(line, predictor):
+    """Answer one newline-delimited JSON request and return the response line
+    
+    The request id, if any, is echoed back so clients can match responses to
+    requests. {"op": "stats"} returns the predictor's counters instead of a
+    prediction, and {"op": "suggest"} the next symptoms worth asking about.
+    Predictions carry a "resolution" object listing inputs that were matched
+    fuzzily or dropped, when there are any.
+    """
+    timer = new_timer()
+    request_id, op, symptoms, error = decode_request(line)
+    timer.mark('parse')
+    try:
+        if error:
+            response = {'id': request_id, 'error': error}
+        elif op == 'stats':
+            response = {'id': request_id, 'stats': predictor.stats()}
+        else:
+            predictor.refresh()
+            timer.mark('refresh')
+            if op == 'suggest':
+                response = {'id': request_id, 'suggestions': predictor.suggest(symptoms, timer=timer)}
+            else:
+                results, resolution = predictor.predict_with_resolution(symptoms, timer=timer)
+                response = {'id': request_id, 'results': results}
+                if resolution:
+                    response['resolution'] = resolution
+    except PoolFullError as e:
+        response = {'id': request_id, 'error': str(e), 'code': 'busy'}
+    except PredictionTimeout as e:
+        response = {'id': request_id, 'error': str(e), 'code': 'timeout'}
     except Exception as e:
-        print(json.dumps({'error': f'Prediction failed: {e}'}))
+        response = {'id': request_id, 'error': f'Prediction failed: {e}'}
+    
+    line = json.dumps(response)
+    timer.mark('serialize')
+    emit_timings('request', timer, id=request_id)
+    return line
+
+def serve_stdio(predictor):
+    """Answer newline-delimited JSON requests on stdin until EOF"""
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        sys.stdout.write(handle_request(line, predictor) + '\n')
+        sys.stdout.flush()
+
+def serve_stdio_pool(pool):
+    """Answer stdin requests through a PredictionPool without blocking the reader
+    
+    Predictions are submitted as they arrive and their responses written as
+    they complete, so responses may come back out of order; clients match
+    them by id. A full queue is answered immediately with code "busy".
+    """
+    write_lock = threading.Lock()
+    
+    def write(response):
+        with write_lock:
+            sys.stdout.write(json.dumps(response) + '\n')
+            sys.stdout.flush()
+    
+    def on_done(request_id, op, future):
+        try:
+            if op == 'suggest':
+                write({'id': request_id, 'suggestions': future.result()})
+            else:
+                results, resolution = future.result()
+                response = {'id': request_id, 'results': results}
+                if resolution:
+                    response['resolution'] = resolution
+                write(response)
+        except PredictionTimeout as e:
+            write({'id': request_id, 'error': str(e), 'code': 'timeout'})
+        except Exception as e:
+            write({'id': request_id, 'error': f'Prediction failed: {e}'})
+    
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        
+        request_id, op, symptoms, error = decode_request(line)
+        if error:
+            write({'id': request_id, 'error': error})
+        elif op == 'stats':
+            write({'id': request_id, 'stats': pool.stats()})
+        else:
+            try:
+                future = pool.submit(symptoms, op=op)
+            except PoolFullError as e:
+                write({'id': request_id, 'error': str(e), 'code': 'busy'})
+            else:
+                future.add_done_callback(lambda f, request_id=request_id, op=op: on_done(request_id, op, f))
+
+def serve_unix_socket(path, predictor):
+    """Answer newline-delimited JSON requests on a Unix domain socket"""
+    if not hasattr(socketserver, 'ThreadingUnixStreamServer'):
+        print(json.dumps({'error': 'Unix sockets are not supported on this platform'}))
         sys.exit(1)
+    
+    class PredictionHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                for raw_line in self.rfile:
+                    line = raw_line.decode('utf-8')
+                    if not line.strip():
+                        continue
+                    response = handle_request(line, predictor)
+                    self.wfile.write((response + '\n').encode('utf-8'))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # Client went away mid-conversation; nothing left to answer
+                pass
+    
+    # Remove a stale socket left behind by a previous run
+    if os.path.exists(path):
+        os.unlink(path)
+    
+    with socketserver.ThreadingUnixStreamServer(path, PredictionHandler) as server:
+        server.daemon_threads = True
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
+
+def predict_jsonl(input_file, output_file, predictor, chunk_size=1000, top_k=5):
+    """Stream a JSONL file of symptom sets through predict_diseases_batch
+    
+    Lines are read and scored chunk_size at a time so memory stays bounded on
+    large logs. Each output line carries the request id (or the 1-based line
+    number when the input has none) and either results or an error.
+    """
+    def flush(chunk, timer):
+        valid = [entry for entry in chunk if 'symptoms' in entry]
+        predictions, resolutions = predictor.predict_batch_with_resolution(
+            [entry['symptoms'] for entry in valid], top_k=top_k, timer=timer)
+        for entry, results, resolution in zip(valid, predictions, resolutions):
+            entry['results'] = results
+            entry['resolution'] = resolution
+        
+        for entry in chunk:
+            response = {'id': entry['id']}
+            if 'error' in entry:
+                response['error'] = entry['error']
+            else:
+                response['results'] = entry['results']
+                if entry['resolution']:
+                    response['resolution'] = entry['resolution']
+            output_file.write(json.dumps(response) + '\n')
+        timer.mark('serialize')
+        emit_timings('batch', timer, rows=len(chunk))
+    
+    chunk = []
+    processed = 0
+    timer = new_timer()
+    for line_number, line in enumerate(input_file, start=1):
+        if not line.strip():
+            continue
+        
+        try:
+            request_id, symptoms, error = parse_symptom_request(json.loads(line))
+        except json.JSONDecodeError:
+            chunk.append({'id': line_number, 'error': 'Invalid JSON input'})
+        else:
+            request_id = line_number if request_id is None else request_id
+            if error:
+                chunk.append({'id': request_id, 'error': error})
+            else:
+                chunk.append({'id': request_id, 'symptoms': symptoms})
+        
+        if len(chunk) >= chunk_size:
+            timer.mark('parse')
+            flush(chunk, timer)
+            processed += len(chunk)
+            chunk = []
+            timer = new_timer()
+    
+    if chunk:
+        timer.mark('parse')
+        flush(chunk, timer)
+        processed += len(chunk)
+    
+    return processed
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Disease prediction from symptoms')
+    parser.add_argument('--serve', action='store_true',
+                        help='keep the model loaded and answer newline-delimited JSON requests on stdin')
+    parser.add_argument('--socket', metavar='PATH',
+                        help='with --serve, listen on this Unix socket instead of stdin/stdout')
+    parser.add_argument('--batch-file', metavar='PATH',
+                        help='score a JSONL file of symptom sets (use - for stdin)')
+    parser.add_argument('--output', metavar='PATH',
+                        help='with --batch-file, write JSONL results here instead of stdout')
+    parser.add_argument('--chunk-size', type=int, default=1000,
+                        help='with --batch-file, number of rows scored per predict_proba call')
+    parser.add_argument('--top-k', type=int, default=5,
+                        help='with --batch-file, number of conditions returned per row')
+    parser.add_argument('--cache-size', type=int, default=1024,
+                        help='with --serve or --batch-file, symptom sets kept in the LRU result cache (0 disables)')
+    parser.add_argument('--mmap', action='store_true',
+                        help='memory-map the model arrays read-only so worker processes share them')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='with --serve, answer requests from this many warm worker processes (0 = in-process)')
+    parser.add_argument('--queue-size', type=int, default=64,
+                        help='with --workers, requests allowed to wait before new ones are rejected as busy')
+    parser.add_argument('--timeout', type=float, default=10.0,
+                        help='with --workers, seconds a request may take, including time queued')
+    parser.add_argument('--bundle', default=BUNDLE_PATH, metavar='PATH',
+                        help=f'model bundle to load (default: {BUNDLE_PATH})')
+    parser.add_argument('--backend', choices=BACKENDS, default=None,
+                        help='model used for scoring (default: $PREDICT_BACKEND, else the random forest)')
+    parser.add_argument('--timings', action='store_true',
+                        help='write per-stage timing records as JSON lines to stderr (or set PREDICT_TIMINGS=1)')
+    parser.add_argument('--metrics-file', metavar='PATH',
+                        help='append timing records to this file instead of stderr (or set PREDICT_METRICS_FILE)')
+    return parser.parse_args(argv)
+
+def run_batch_file(args, predictor):
+    """Handle --batch-file, reading from and writing to files or stdio"""
+    input_file = sys.stdin if args.batch_file == '-' else open(args.batch_file, 'r')
+    output_file = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        processed = predict_jsonl(input_file, output_file, predictor,
+                                  chunk_size=args.chunk_size, top_k=args.top_k)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    
+    print(f'Scored {processed} rows', file=sys.stderr)
+    stats = {'resolver': predictor.resolver.stats()}
+    if predictor.cache is not None:
+        stats['cache'] = predictor.cache.stats()
+    print(json.dumps(stats), file=sys.stderr)
 
 def main():
     """Main function to handle prediction requests"""
+    args = parse_args()
+    configure_timings(args.timings, args.metrics_file)
+    
     try:
+        if args.serve and args.workers > 0:
+            # Workers always map the model so they share one copy
+            with PredictionPool(workers=args.workers, queue_size=args.queue_size, timeout=args.timeout,
+                                cache_size=args.cache_size, mmap=True, backend=args.backend,
+                                path=args.bundle) as pool:
+                if args.socket:
+                    serve_unix_socket(args.socket, pool)
+                else:
+                    serve_stdio_pool(pool)
+            return
+        
+        if args.serve or args.batch_file:
+            predictor = Predictor(cache_size=args.cache_size, mmap=args.mmap, backend=args.backend,
+                                  path=args.bundle)
+            if args.batch_file:
+                run_batch_file(args, predictor)
+            elif args.socket:
+                serve_unix_socket(args.socket, predictor)
+            else:
+                serve_stdio(predictor)
+            return
+        
+        timer = new_timer()
+        
         # Load model and data
-        model, symptom_names, symptom_mapping, diseases = load_model_and_data()
+        model, symptom_names, symptom_mapping, diseases = load_model_and_data(
+            mmap=args.mmap, path=args.bundle, timer=timer, backend=args.backend)
         
         # Read input from stdin
         input_data = sys.stdin.read()
-        symptoms = json.loads(input_data)
+        _, symptoms, error = parse_symptom_request(json.loads(input_data))
+        if error:
+            print(json.dumps({'error': error}))
+            sys.exit(1)
+        timer.mark('parse')
+        
+        # Map spelling and case variants onto the model's symptom names
+        symptoms, resolution = SymptomResolver(symptom_names).resolve(symptoms)
+        if resolution:
+            print(json.dumps({'resolution': resolution}), file=sys.stderr)
+        timer.mark('resolve')
         
         # Make predictions
-        results = predict_diseases(symptoms, model, symptom_names, symptom_mapping, diseases)
+        try:
+            results = predict_diseases(symptoms, model, symptom_names, symptom_mapping, diseases, timer=timer)
+        except Exception as e:
+            print(json.dumps({'error': f'Prediction failed: {e}'}))
+            sys.exit(1)
         
         # Output results as JSON
-        print(json.dumps(results))
+        output = json.dumps(results)
+        timer.mark('serialize')
+        print(output)
+        emit_timings('request', timer)
         
+    except BundleError as e:
+        print(json.dumps({'error': str(e)}))
+        sys.exit(1)
     except json.JSONDecodeError:
         print(json.dumps({'error': 'Invalid JSON input'}))
         sys.exit(1)
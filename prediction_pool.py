@@ -0,0 +1,300 @@
+"""
+Multi-process prediction worker pool for predict.py
+
+Runs N warm worker processes, each holding a loaded Predictor, behind a
+bounded request queue. Requests are rejected immediately when the queue is
+full, and each request has a deadline measured from submission; a worker
+that overruns it is killed and replaced so a stuck prediction cannot hold a
+slot forever.
+"""
+
+import os
+import sys
+import time
+import queue
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future
+
+from model_bundle import BUNDLE_PATH
+
+class PoolFullError(Exception):
+    """Raised by submit() when the request queue is full"""
+
+class PredictionTimeout(Exception):
+    """Set on a request's future when it misses its deadline"""
+
+class WorkerError(Exception):
+    """Set on a request's future when the worker failed to answer"""
+
+def _worker_main(conn, cache_size, mmap, backend, path):
+    """Worker process: load the model once, then answer requests from conn
+
+    Every reply is (status, payload, worker state), the state being the
+    resolver counters and any reload error, so the parent can report them
+    across workers without asking.
+    """
+    # stdout belongs to the parent's protocol; keep worker output off it
+    sys.stdout = sys.stderr
+
+    from predict import Predictor, configure_timings, new_timer, emit_timings
+
+    # Timing output is configured through the inherited environment
+    configure_timings()
+    try:
+        predictor = Predictor(cache_size=cache_size, mmap=mmap, backend=backend, path=path)
+    except Exception as e:
+        conn.send(('error', str(e)))
+        return
+    conn.send(('ready', None))
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        op, symptoms = request
+
+        timer = new_timer()
+        try:
+            predictor.refresh()
+            timer.mark('refresh')
+            if op == 'suggest':
+                results = predictor.suggest(symptoms, timer=timer)
+            else:
+                results = predictor.predict_with_resolution(symptoms, timer=timer)
+            conn.send(('ok', results, _worker_state(predictor)))
+            timer.mark('serialize')
+        except Exception as e:
+            conn.send(('error', str(e), _worker_state(predictor)))
+        emit_timings('request', timer)
+
+def _worker_state(predictor):
+    return {'resolver': predictor.resolver.stats(), 'reload_error': predictor.reload_error}
+
+class _Task:
+    __slots__ = ('op', 'symptoms', 'future', 'deadline')
+
+    def __init__(self, op, symptoms, deadline):
+        self.op = op
+        self.symptoms = symptoms
+        self.future = Future()
+        self.deadline = deadline
+
+class _WorkerSlot:
+    """One worker process and the dispatcher thread that feeds it"""
+
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.busy = False
+        self.busy_seconds = 0.0
+        self.state = None
+        self.thread = threading.Thread(target=self._run, name=f'prediction-worker-{index}', daemon=True)
+
+    def spawn(self):
+        """Start the worker process and wait until its model is loaded"""
+        parent_conn, child_conn = self.pool.context.Pipe()
+        self.process = self.pool.context.Process(
+            target=_worker_main,
+            args=(child_conn, self.pool.cache_size, self.pool.mmap, self.pool.backend, self.pool.path),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+        if not self.conn.poll(self.pool.startup_timeout):
+            self.kill()
+            raise WorkerError(f'Worker {self.index} did not start within {self.pool.startup_timeout}s')
+        try:
+            status, payload = self.conn.recv()
+        except EOFError:
+            self.kill()
+            raise WorkerError(f'Worker {self.index} exited during startup (exit code {self.process.exitcode})')
+        if status != 'ready':
+            self.kill()
+            raise WorkerError(f'Worker {self.index} could not load the model: {payload}')
+
+    def kill(self):
+        """Terminate the worker process"""
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=5)
+        if self.conn is not None:
+            self.conn.close()
+
+    def respawn(self):
+        """Replace a dead or stuck worker"""
+        self.kill()
+        self.pool._count('restarts')
+        try:
+            self.spawn()
+        except WorkerError as e:
+            # Leave the slot broken; the next request on it retries the spawn
+            print(f'Prediction pool: {e}', file=sys.stderr)
+
+    def _run(self):
+        while True:
+            task = self.pool._queue.get()
+            if task is None:
+                break
+            if task.future.done():
+                continue
+
+            remaining = task.deadline - time.monotonic()
+            if remaining <= 0:
+                self.pool._count('timed_out')
+                task.future.set_exception(PredictionTimeout('Request timed out while queued'))
+                continue
+
+            self.busy = True
+            started = time.monotonic()
+            try:
+                self.conn.send((task.op, task.symptoms))
+                if self.conn.poll(remaining):
+                    status, payload, self.state = self.conn.recv()
+                    if status == 'ok':
+                        self.pool._count('completed')
+                        task.future.set_result(payload)
+                    else:
+                        self.pool._count('failed')
+                        task.future.set_exception(WorkerError(payload))
+                else:
+                    self.pool._count('timed_out')
+                    task.future.set_exception(PredictionTimeout('Prediction timed out'))
+                    self.respawn()
+            except (EOFError, OSError) as e:
+                self.pool._count('failed')
+                if not task.future.done():
+                    task.future.set_exception(WorkerError(f'Worker crashed: {e}'))
+                self.respawn()
+            finally:
+                self.busy_seconds += time.monotonic() - started
+                self.busy = False
+
+class PredictionPool:
+    """N warm predictor processes behind a bounded queue
+
+    submit() returns a concurrent.futures.Future that always resolves: with
+    the prediction results, PredictionTimeout, or WorkerError. It raises
+    PoolFullError straight away when queue_size requests are already
+    waiting.
+    """
+
+    def __init__(self, workers=None, queue_size=64, timeout=10.0, cache_size=1024, mmap=True,
+                 startup_timeout=60.0, backend=None, path=BUNDLE_PATH):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.mmap = mmap
+        self.startup_timeout = startup_timeout
+        self.backend = backend
+        self.path = path
+        self.context = mp.get_context('spawn')
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._counters = {'submitted': 0, 'completed': 0, 'rejected': 0, 'timed_out': 0, 'failed': 0, 'restarts': 0}
+        self._counter_lock = threading.Lock()
+        self._slots = [_WorkerSlot(self, index) for index in range(self.workers)]
+        self._started_at = None
+
+    def start(self):
+        """Spawn the workers and wait until every model is loaded"""
+        for slot in self._slots:
+            slot.spawn()
+        for slot in self._slots:
+            slot.thread.start()
+        self._started_at = time.monotonic()
+        return self
+
+    def close(self):
+        """Let queued requests finish, then stop the workers"""
+        for _ in self._slots:
+            self._queue.put(None)
+        for slot in self._slots:
+            slot.thread.join()
+            if slot.conn is not None:
+                try:
+                    slot.conn.send(None)
+                    slot.process.join(timeout=5)
+                except OSError:
+                    pass
+            slot.kill()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _count(self, name):
+        with self._counter_lock:
+            self._counters[name] += 1
+
+    def submit(self, symptoms, timeout=None, op='predict'):
+        """Queue a prediction (or, with op='suggest', a symptom suggestion)
+
+        A prediction's future resolves to (results, resolution report); see
+        Predictor.predict_with_resolution. Raises PoolFullError if the queue
+        is full.
+        """
+        task = _Task(op, symptoms, time.monotonic() + (timeout or self.timeout))
+        try:
+            self._queue.put_nowait(task)
+        except queue.Full:
+            self._count('rejected')
+            raise PoolFullError(f'Prediction queue is full ({self.queue_size} waiting)')
+        self._count('submitted')
+        return task.future
+
+    def predict_with_resolution(self, symptoms, timeout=None, timer=None):
+        """Blocking submit(); raises PoolFullError, PredictionTimeout or WorkerError
+
+        timer is accepted for interface parity with Predictor; stage timings
+        are recorded inside the workers.
+        """
+        return self.submit(symptoms, timeout=timeout).result()
+
+    def predict(self, symptoms, timeout=None, timer=None):
+        """Blocking prediction results only"""
+        return self.predict_with_resolution(symptoms, timeout=timeout)[0]
+
+    def suggest(self, symptoms, timeout=None, timer=None):
+        """Blocking symptom suggestions"""
+        return self.submit(symptoms, timeout=timeout, op='suggest').result()
+
+    def refresh(self):
+        """Workers check the model artifact themselves before each request"""
+
+    def stats(self):
+        """Queue depth, worker utilisation, request counters, the workers' summed resolver counters and reload errors"""
+        busy = sum(slot.busy for slot in self._slots)
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        busy_seconds = sum(slot.busy_seconds for slot in self._slots)
+        with self._counter_lock:
+            counters = dict(self._counters)
+
+        # Each worker's latest counters; a replaced worker starts again from zero
+        states = [slot.state for slot in self._slots if slot.state]
+        reported = [state['resolver'] for state in states]
+        resolver = {key: sum(stats[key] for stats in reported) for key in ('fuzzy_matches', 'dropped', 'memo_size')}
+        if reported:
+            resolver['fuzzy_backend'] = reported[0]['fuzzy_backend']
+
+        return dict(
+            workers=self.workers,
+            busy_workers=busy,
+            utilisation=round(busy_seconds / (elapsed * self.workers), 4) if elapsed else 0.0,
+            queue_depth=self._queue.qsize(),
+            queue_size=self.queue_size,
+            timeout=self.timeout,
+            resolver=resolver,
+            reload_errors=sorted({state['reload_error'] for state in states if state['reload_error']}),
+            **counters
+        )
@@ -0,0 +1,119 @@
+"""
+Symptom name resolution for predict.py
+Maps free-form symptom strings from the frontend onto the model's symptom
+names: exact names first, then a hash index of normalized names (case,
+punctuation and spacing ignored), then a fuzzy match against the
+precomputed normalized names. Fuzzy lookups are memoised, so repeated
+variants cost one dict lookup, and rapidfuzz is only imported by the first
+one, so requests whose symptoms all match never load it.
+"""
+
+import re
+import difflib
+import functools
+import threading
+import importlib.util
+from collections import OrderedDict
+
+_NON_ALPHANUMERIC = re.compile(r'[^a-z0-9]+')
+
+@functools.lru_cache(maxsize=None)
+def _rapidfuzz():
+    """rapidfuzz's (fuzz, process) modules, or None when it is not installed"""
+    try:
+        from rapidfuzz import fuzz, process
+    except ImportError:
+        # difflib is used instead; slower, but results are memoised
+        return None
+    return fuzz, process
+
+def normalize_symptom(text):
+    """Lowercase and collapse everything but letters and digits to single spaces"""
+    return _NON_ALPHANUMERIC.sub(' ', str(text).lower()).strip()
+
+class SymptomResolver:
+    """Resolve symptom strings to model symptom names
+
+    resolve() returns the resolved names (deduplicated, in input order) and
+    a report of the inputs that needed a fuzzy match or were dropped, or
+    None when every input matched exactly or after normalization.
+    """
+
+    def __init__(self, symptom_names, score_cutoff=85, memo_size=4096):
+        self.score_cutoff = score_cutoff
+        self.memo_size = memo_size
+        self._names = set(symptom_names)
+        self._normalized = {}
+        for name in symptom_names:
+            self._normalized.setdefault(normalize_symptom(name), name)
+        self._choices = list(self._normalized)
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self.fuzzy_matches = 0
+        self.dropped = 0
+
+    def _fuzzy(self, key):
+        """Best normalized name for key above score_cutoff, memoised (misses too)"""
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+
+        match = None
+        if key:
+            rapidfuzz = _rapidfuzz()
+            if rapidfuzz is not None:
+                fuzz, process = rapidfuzz
+                best = process.extractOne(key, self._choices, scorer=fuzz.token_sort_ratio,
+                                          score_cutoff=self.score_cutoff)
+                match = self._normalized[best[0]] if best else None
+            else:
+                best = difflib.get_close_matches(key, self._choices, n=1, cutoff=self.score_cutoff / 100)
+                match = self._normalized[best[0]] if best else None
+
+        with self._lock:
+            self._memo[key] = match
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return match
+
+    def resolve(self, symptoms):
+        """Return (names, report) for a list of symptom strings"""
+        names, seen = [], set()
+        fuzzy, dropped = {}, []
+        for symptom in symptoms:
+            if symptom in self._names:
+                name = symptom
+            else:
+                key = normalize_symptom(symptom)
+                name = self._normalized.get(key)
+                if name is None:
+                    name = self._fuzzy(key)
+                    if name is None:
+                        dropped.append(symptom)
+                        continue
+                    fuzzy[str(symptom)] = name
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+
+        if not fuzzy and not dropped:
+            return names, None
+        self.fuzzy_matches += len(fuzzy)
+        self.dropped += len(dropped)
+        report = {}
+        if fuzzy:
+            report['fuzzy'] = fuzzy
+        if dropped:
+            report['dropped'] = dropped
+        return names, report
+
+    def stats(self):
+        """Fuzzy match and drop counters"""
+        return {
+            # find_spec, not _rapidfuzz(): reporting stats must not import rapidfuzz
+            'fuzzy_backend': 'rapidfuzz' if importlib.util.find_spec('rapidfuzz') is not None else 'difflib',
+            'fuzzy_matches': self.fuzzy_matches,
+            'dropped': self.dropped,
+            'memo_size': len(self._memo),
+        }
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts under test live at the repository root and in lib/, not in a package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'lib'))
@@ -0,0 +1,69 @@
+"""OCRProcessor.clean_ocr_text must match the original regex-per-rule version
+
+benchmark_clean_text.py times both with legacy_clean_ocr_text and
+synthetic_report from here.
+"""
+import re
+
+import numpy as np
+import pytest
+
+GOLDEN_SAMPLES = [
+    '',
+    '   ',
+    'Hgb 13.5 g/dL  Hct 40 %\nWBC 7.2 RBC 4.8 Plt 250',
+    'HDL: 45 mg/dL | LDL: 130 mg/dL | Trig 150 | Chol 210',
+    'glu 98 creat 1.0 na 140 k 4.1 cl 102 ca 9.5',
+    'ALT 25 AST 30 ALP 80 Bil 0.8 Alb 4.2 CRP 3 ESR 10 Trop 0.01 BNP 50',
+    'Hgb/Hct (Na+, K+) [Ca] {Cl} Glu-Creat; HDL,LDL',
+    'Cholesterol Calcium Nak Kidney Albumin Bilirubin Troponin',
+    'Patient:  John   Doe\t\tDOB: 01/01/1970\r\n\r\nRef № 12-B • ✓ checked ™',
+    'hDl LdL wBc rbc PLT tRiG',
+    'K-ALT, AST- ESR+BNP=Na/Cl',
+    'Unicode: naïve café TRİG bıl ESſ AſT K',
+    'Line1\nLine2\n\n\nLine3 ( spaced ) [ brackets ] 10 % off !',
+]
+
+def legacy_clean_ocr_text(text, medical_fixes):
+    """clean_ocr_text as it was before the rules were precompiled; the golden reference"""
+    if not text:
+        return ""
+    text = re.sub(r'\s+', ' ', text.strip())
+    text = re.sub(r'[|]', 'I', text)
+    text = re.sub(r'[0]', 'O', text)
+    text = re.sub(r'[1]', 'l', text)
+    text = re.sub(r'[^\w\s\.\,\:\;\-\+\=\/\(\)\[\]\{\}\%\@\#\$\*\!\?\'\"]', '', text)
+    text = re.sub(r'\s+([\.\,\:\;\-\+\=\/\(\)\[\]\{\}\%\@\#\$\*\!\?])\s*', r'\1', text)
+    for abbr, full_name in medical_fixes.items():
+        text = re.sub(rf'\b{abbr}\b', full_name, text, flags=re.IGNORECASE)
+    return text.strip()
+
+def synthetic_report(rng, n_lines, medical_fixes):
+    """OCR-like report text: abbreviations in mixed case, numbers, punctuation and noise"""
+    vocabulary = list(medical_fixes) + [abbr.lower() for abbr in medical_fixes] + [
+        'Patient', 'Result', 'Range', 'mg/dL', 'g/dL', 'mmol/L', 'Normal', 'High', 'Low',
+        'Specimen', 'Serum', 'Collected', 'Report', '|', '(', ')', ':', '-', '%', '•', '~',
+    ]
+    lines = []
+    for _ in range(n_lines):
+        words = rng.choice(vocabulary, size=int(rng.integers(3, 10)))
+        values = [f'{rng.uniform(0, 300):.1f}' for _ in range(int(rng.integers(1, 3)))]
+        lines.append('  '.join(list(words) + values))
+    return '\n'.join(lines)
+
+@pytest.fixture(scope='module')
+def ocr_processor():
+    # Needs the OCR dependencies (pytesseract, pdf2image) installed
+    return pytest.importorskip('ocr_processor')
+
+@pytest.mark.parametrize('text', GOLDEN_SAMPLES)
+def test_golden_samples(ocr_processor, text):
+    clean = ocr_processor.OCRProcessor(ocr_workers=1).clean_ocr_text
+    assert clean(text) == legacy_clean_ocr_text(text, ocr_processor.MEDICAL_FIXES)
+
+def test_synthetic_reports(ocr_processor):
+    clean = ocr_processor.OCRProcessor(ocr_workers=1).clean_ocr_text
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        text = synthetic_report(rng, 200, ocr_processor.MEDICAL_FIXES)
+        assert clean(text) == legacy_clean_ocr_text(text, ocr_processor.MEDICAL_FIXES)
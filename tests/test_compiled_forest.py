@@ -0,0 +1,60 @@
+"""CompiledForest must reproduce sklearn's RandomForestClassifier.predict_proba"""
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from compact_model import compact_forest
+from predict import CompiledForest
+from train_model import compile_forest
+
+N_FEATURES = 12
+
+def fit_forest(X, seed=0):
+    """A small forest on a noisy 4-class rule over the first features (scaled to [0, 1])"""
+    scaled = X / X.max()
+    y = (scaled[:, 0] > 0.5).astype(int) + 2 * (scaled[:, 1] + scaled[:, 2] > 1.0)
+    flip = np.random.default_rng(seed).random(len(y)) < 0.1
+    y[flip] = (y[flip] + 1) % 4
+    return RandomForestClassifier(n_estimators=15, max_depth=8, random_state=seed).fit(X, y)
+
+@pytest.fixture(scope='module')
+def binary_forest():
+    X = (np.random.default_rng(1).random((600, N_FEATURES)) < 0.4).astype(np.float32)
+    return fit_forest(X)
+
+def binary_rows(n, seed=2):
+    return (np.random.default_rng(seed).random((n, N_FEATURES)) < 0.4).astype(np.float32)
+
+# One row, a SMALL_BATCH-sized gather and a batch spanning several APPLY_CHUNKs
+BATCH_SIZES = (1, CompiledForest.SMALL_BATCH, 2 * CompiledForest.APPLY_CHUNK + 7)
+
+@pytest.mark.parametrize('rows', BATCH_SIZES)
+def test_binary_input_matches_sklearn(binary_forest, rows):
+    compiled = CompiledForest(compile_forest(binary_forest))
+    assert compiled.binary_splits
+    X = binary_rows(rows)
+    np.testing.assert_allclose(compiled.predict_proba(X), binary_forest.predict_proba(X), atol=1e-9)
+
+@pytest.mark.parametrize('rows', BATCH_SIZES)
+def test_non_binary_input_takes_threshold_path(binary_forest, rows):
+    compiled = CompiledForest(compile_forest(binary_forest))
+    # Values between 0 and 1 land on both sides of the 0.5 thresholds
+    X = np.random.default_rng(3).random((rows, N_FEATURES)).astype(np.float32)
+    np.testing.assert_allclose(compiled.predict_proba(X), binary_forest.predict_proba(X), atol=1e-9)
+
+def test_continuous_forest_matches_sklearn():
+    X = np.random.default_rng(4).random((600, N_FEATURES)).astype(np.float32) * 3
+    model = fit_forest(X)
+    compiled = CompiledForest(compile_forest(model))
+    assert not compiled.binary_splits
+    X_test = np.random.default_rng(5).random((300, N_FEATURES)).astype(np.float32) * 3
+    np.testing.assert_allclose(compiled.predict_proba(X_test), model.predict_proba(X_test), atol=1e-9)
+
+@pytest.mark.parametrize('rows', BATCH_SIZES)
+def test_sparse_leaves_match_sklearn(binary_forest, rows):
+    # No pruning or tree selection, so only the leaf storage differs
+    arrays = compact_forest(binary_forest, None, None, tolerance=0.0, max_drop=None, precision='float32')
+    compiled = CompiledForest(arrays)
+    assert compiled.leaf_values is None
+    X = binary_rows(rows, seed=6)
+    np.testing.assert_allclose(compiled.predict_proba(X), binary_forest.predict_proba(X), atol=1e-6)
@@ -6,10 +6,8 @@ python train_model.py
 
 echo.
 echo Training complete! Check the generated files:
-echo - trained_model.pkl
-echo - symptom_names.json
-echo - diseases.json
-echo - symptom_mapping.json
+echo - model_bundle.bin
 echo - symptom_categories.json
+echo - training_report.json
 echo.
 pause 
\ No newline at end of file
@@ -2,51 +2,293 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.naive_bayes import BernoulliNB
 from sklearn.metrics import accuracy_score, classification_report
-import joblib
 import json
+import pickle
+import hashlib
+import os
+import sys
+import time
+import argparse
+import itertools
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pandas.api.types import union_categoricals
+from datetime import datetime, timezone
+import sklearn
 
-def load_and_preprocess_data():
-    """Load and preprocess the disease-symptoms dataset"""
+from model_bundle import (BUNDLE_PATH, BundleError, write_bundle, read_header, load_arrays, load_sklearn_model,
+                          load_test_rows)
+
+DATASET_PATH = 'Disease and symptoms dataset.csv'
+
+REPORT_PATH = 'training_report.json'
+
+class TrainingProfile:
+    """Wall and CPU time per training stage plus facts about the run
+    
+    mark(stage) charges the wall time and process CPU time since the previous
+    mark (or creation) to stage, accumulating if the stage repeats. CPU time
+    covers every thread of this process, so it exceeds wall time when
+    fitting uses several cores.
+    """
+    
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.stages = {}
+        self.facts = {}
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+    
+    def mark(self, stage):
+        wall, cpu = time.perf_counter(), time.process_time()
+        totals = self.stages.setdefault(stage, {'wall_s': 0.0, 'cpu_s': 0.0})
+        totals['wall_s'] += wall - self._wall
+        totals['cpu_s'] += cpu - self._cpu
+        self._wall, self._cpu = wall, cpu
+    
+    def note(self, **facts):
+        """Record facts about the run (dataset shape, accuracy, ...) for the report"""
+        self.facts.update(facts)
+    
+    def report(self):
+        stages = {stage: {key: round(value, 3) for key, value in totals.items()}
+                  for stage, totals in self.stages.items()}
+        return {
+            'started_at': self.started_at,
+            'stages': stages,
+            'total_wall_s': round(sum(totals['wall_s'] for totals in self.stages.values()), 3),
+            'total_cpu_s': round(sum(totals['cpu_s'] for totals in self.stages.values()), 3),
+            'peak_rss_mib': peak_rss_mib(),
+            **self.facts,
+        }
+    
+    def write(self, path=REPORT_PATH):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2, default=str)
+        print(f"Training report saved to {path}")
+
+def peak_rss_mib():
+    """Peak resident set size of this process in MiB, or None where unavailable (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    return round(peak / 2**20 if sys.platform == 'darwin' else peak / 1024, 1)
+
+# Bump when the parsed representation changes so older caches are ignored
+DATASET_CACHE_VERSION = 1
+
+def dataset_cache_path(path):
+    """Binary cache file kept next to the CSV"""
+    return path + '.cache.npz'
+
+def dataset_cache_key(path):
+    """Cache key: cache format version, CSV content hash and column header"""
+    with open(path, newline='') as f:
+        header = f.readline()
+    digest = hashlib.sha256()
+    digest.update(f'{DATASET_CACHE_VERSION}\n{file_sha256(path)}\n{header}'.encode('utf-8'))
+    return digest.hexdigest()
+
+def read_dataset_cache(cache_path, key):
+    """Return (diseases, symptoms) from the cache, or None if it is missing or stale"""
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            if str(cache['key']) != key:
+                return None
+            diseases = pd.Series(
+                pd.Categorical.from_codes(cache['disease_codes'], cache['disease_categories'].tolist()),
+                name=str(cache['disease_column'])
+            )
+            symptoms = pd.DataFrame(cache['symptoms'], columns=cache['symptom_names'].tolist())
+    except (OSError, KeyError, ValueError):
+        return None
+    return diseases, symptoms
+
+def write_dataset_cache(cache_path, key, diseases, symptoms):
+    """Write the parsed dataset atomically so a crashed run never leaves a torn cache
+    
+    Returns whether the cache was written; an OSError (read-only directory,
+    full disk) is reported and training continues without a cache.
+    """
+    directory = os.path.dirname(os.path.abspath(cache_path))
+    temp_path = None
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.dataset-cache-', suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(
+                f,
+                key=np.array(key),
+                disease_column=np.array(str(diseases.name)),
+                disease_codes=diseases.cat.codes.to_numpy(),
+                disease_categories=np.array(diseases.cat.categories, dtype=str),
+                symptom_names=np.array(symptoms.columns, dtype=str),
+                symptoms=symptoms.to_numpy(dtype=np.uint8),
+            )
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        # A cache that cannot be written only costs the next run a CSV parse
+        print(f"Dataset cache write failed, continuing without a cache: {e}")
+        if temp_path is not None and os.path.exists(temp_path):
+            os.unlink(temp_path)
+        return False
+    except BaseException:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return True
+
+def load_and_preprocess_data(path=DATASET_PATH, chunksize=None, cache=True):
+    """Load and preprocess the disease-symptoms dataset
+    
+    Symptom columns are parsed straight into uint8 and the disease column into
+    a categorical, so the 0/1 matrix takes one byte per cell instead of an
+    int64 copy. With chunksize the CSV is parsed that many rows at a time,
+    which bounds the parser's own buffers on very large exports.
+    
+    With cache=True the parsed result is kept in an .npz next to the CSV,
+    keyed by the CSV's content hash and header; later runs load it instead of
+    parsing, and any change to the CSV invalidates it.
+    """
     print("Loading dataset...")
+    start = time.perf_counter()
     
-    # Load the CSV file
-    df = pd.read_csv('Disease and symptoms dataset.csv')
+    if cache:
+        cache_path = dataset_cache_path(path)
+        key = dataset_cache_key(path)
+        cached = read_dataset_cache(cache_path, key)
+        if cached is not None:
+            diseases, symptoms = cached
+            print(f"Loaded parsed dataset from {cache_path} in {time.perf_counter() - start:.2f}s")
+            print_dataset_stats(diseases, symptoms)
+            return diseases, symptoms
     
-    print(f"Dataset shape: {df.shape}")
-    print(f"Columns: {len(df.columns)}")
+    # Trace allocations so the peak memory of loading can be reported
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
     
-    # The first column is the disease name
-    diseases = df.iloc[:, 0]
-    symptoms = df.iloc[:, 1:]  # All other columns are symptoms
+    # Read only the header first to build the column dtypes
+    columns = pd.read_csv(path, nrows=0).columns
+    disease_column = columns[0]  # The first column is the disease name
+    dtypes = {column: np.uint8 for column in columns[1:]}  # All other columns are symptoms
+    dtypes[disease_column] = 'category'
     
-    print(f"Number of diseases: {len(diseases.unique())}")
-    print(f"Number of symptoms: {len(symptoms.columns)}")
+    if chunksize:
+        disease_parts, symptom_parts = [], []
+        for chunk in pd.read_csv(path, dtype=dtypes, chunksize=chunksize):
+            disease_parts.append(chunk.pop(disease_column).array)
+            symptom_parts.append(chunk)
+        # Chunks see different disease subsets; merge their categories
+        diseases = pd.Series(union_categoricals(disease_parts), name=disease_column)
+        symptoms = pd.concat(symptom_parts, ignore_index=True)
+        del symptom_parts
+    else:
+        symptoms = pd.read_csv(path, dtype=dtypes)
+        diseases = symptoms.pop(disease_column)
+    
+    _, peak = tracemalloc.get_traced_memory()
+    if not already_tracing:
+        tracemalloc.stop()
+    
+    print(f"Parsed CSV in {time.perf_counter() - start:.2f}s")
+    print_dataset_stats(diseases, symptoms)
+    print(f"Peak memory while loading: {peak / 2**20:.1f} MiB")
     
-    # Convert symptoms to numeric (some might be strings)
-    symptoms = symptoms.astype(int)
+    if cache and write_dataset_cache(cache_path, key, diseases, symptoms):
+        print(f"Cached parsed dataset in {cache_path}")
     
     return diseases, symptoms
 
-def train_model(diseases, symptoms):
-    """Train a Random Forest model on the disease-symptoms data"""
+def print_dataset_stats(diseases, symptoms):
+    """Print the shape and memory footprint of a parsed dataset"""
+    print(f"Dataset shape: {(len(symptoms), len(symptoms.columns) + 1)}")
+    print(f"Columns: {len(symptoms.columns) + 1}")
+    print(f"Number of diseases: {len(diseases.cat.categories)}")
+    print(f"Number of symptoms: {len(symptoms.columns)}")
+    print(f"Symptom matrix size: {symptoms.memory_usage(index=False).sum() / 2**20:.1f} MiB")
+
+def collapse_duplicates(diseases, symptoms):
+    """Collapse identical (disease, symptom-vector) rows into unique rows with counts
+    
+    Each row is keyed by its disease code followed by its raw symptom bytes
+    and the keys are deduplicated with numpy.unique. Returns the unique
+    diseases and symptoms, in order of first appearance, and an int array of
+    how many original rows each one stands for.
+    """
+    if isinstance(diseases.dtype, pd.CategoricalDtype):
+        codes = diseases.cat.codes.to_numpy()
+    else:
+        codes = pd.factorize(diseases)[0]
+    
+    matrix = np.ascontiguousarray(symptoms.to_numpy(dtype=np.uint8))
+    keys = np.concatenate([codes.astype('<i4').view(np.uint8).reshape(-1, 4), matrix], axis=1)
+    keys = np.ascontiguousarray(keys).view(np.dtype((np.void, keys.shape[1]))).ravel()
+    
+    _, first_index, counts = np.unique(keys, return_index=True, return_counts=True)
+    order = np.argsort(first_index)
+    first_index, counts = first_index[order], counts[order]
+    
+    unique_diseases = diseases.iloc[first_index].reset_index(drop=True)
+    unique_symptoms = symptoms.iloc[first_index].reset_index(drop=True)
+    return unique_diseases, unique_symptoms, counts
+
+def train_model(diseases, symptoms, sample_weight=None, profile=None):
+    """Train a Random Forest model on the disease-symptoms data
+    
+    With sample_weight (the row counts from collapse_duplicates) each unique
+    row stands for that many identical rows: fitting receives it as
+    sample_weight and accuracy and the classification report are weighted
+    by it. profile receives the split, fit and evaluate stages. Returns the
+    model, the symptom names and the sorted indices of the held-out rows.
+    """
     print("Training model...")
+    profile = profile or TrainingProfile()
+    
+    if sample_weight is None:
+        sample_weight = np.ones(len(diseases), dtype=np.int64)
+        weighted = False
+    else:
+        weighted = True
     
     # Use regular train_test_split instead of stratified due to some classes having only 1 sample
-    X_train, X_test, y_train, y_test = train_test_split(
-        symptoms, diseases, test_size=0.2, random_state=42
+    X_train, X_test, y_train, y_test, w_train, w_test, _, test_rows = train_test_split(
+        symptoms, diseases, sample_weight, np.arange(len(diseases)), test_size=0.2, random_state=42
     )
+    profile.mark('split')
     
-    print(f"Training set size: {len(X_train)}")
-    print(f"Test set size: {len(X_test)}")
+    if weighted:
+        print(f"Training set size: {len(X_train)} unique rows ({int(w_train.sum())} rows)")
+        print(f"Test set size: {len(X_test)} unique rows ({int(w_test.sum())} rows)")
+    else:
+        print(f"Training set size: {len(X_train)}")
+        print(f"Test set size: {len(X_test)}")
     
     # Train Random Forest classifier
     model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
-    model.fit(X_train, y_train)
+    start = time.perf_counter()
+    model.fit(X_train, y_train, sample_weight=w_train if weighted else None)
+    fit_seconds = time.perf_counter() - start
+    print(f"Fit time: {fit_seconds:.2f}s")
+    if weighted:
+        # Tree building is at least linear in rows, so this underestimates the uncollapsed fit
+        fit_saved = fit_seconds * (w_train.sum() / len(X_train) - 1)
+        print(f"Fit on {len(X_train)} unique rows instead of {int(w_train.sum())}: ~{fit_saved:.2f}s saved")
+        profile.note(dedup_fit_saved_s=round(float(fit_saved), 3))
+    profile.mark('fit')
     
     # Evaluate the model
+    start = time.perf_counter()
     y_pred = model.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred)
+    accuracy = accuracy_score(y_test, y_pred, sample_weight=w_test)
+    print(f"Evaluation time: {time.perf_counter() - start:.2f}s")
     
     print(f"Model accuracy: {accuracy:.3f}")
     print("\nClassification Report (top 10 classes):")
@@ -56,36 +298,530 @@ def train_model(diseases, symptoms):
     if len(unique_classes) > 10:
         print(f"Showing report for top 10 classes (out of {len(unique_classes)} total classes)")
     
-    print(classification_report(y_test, y_pred, target_names=unique_classes[:10]))
+    print(classification_report(y_test, y_pred, labels=unique_classes[:10], target_names=unique_classes[:10],
+                                sample_weight=w_test))
+    profile.mark('evaluate')
+    profile.note(holdout_accuracy=round(float(accuracy), 4), train_rows=len(X_train), test_rows=len(X_test))
     
-    return model, symptoms.columns.tolist()
+    return model, symptoms.columns.tolist(), np.sort(test_rows)
 
-def save_model_and_data(model, symptom_names, diseases):
-    """Save the trained model and metadata"""
-    print("Saving model and data...")
+def split_rows(test_rows, *arrays):
+    """train_test_split-style (train, test) pairs for each array, holding out exactly test_rows"""
+    held_out = np.zeros(len(arrays[0]), dtype=bool)
+    held_out[test_rows] = True
+    parts = []
+    for array in arrays:
+        if isinstance(array, (pd.Series, pd.DataFrame)):
+            parts += [array.iloc[~held_out], array.iloc[held_out]]
+        else:
+            parts += [array[~held_out], array[held_out]]
+    return parts
+
+def plan_incremental(dataset_path, bundle_path=BUNDLE_PATH):
+    """Decide how an incremental run should treat the current dataset
+    
+    Returns a dict whose 'action' is 'skip' (the CSV is byte-for-byte the
+    one the bundle was trained on), 'grow' (rows were appended to that CSV)
+    or 'full' (anything else, with a 'reason'). Appends are detected by
+    hashing the first training_data_bytes bytes of the CSV. Raises
+    SystemExit if the symptom columns differ from the bundle's.
+    """
+    data_hash = file_sha256(dataset_path)
+    plan = {'action': 'full', 'hash': data_hash, 'bytes': os.path.getsize(dataset_path)}
+    
+    try:
+        header = read_header(bundle_path)
+    except (FileNotFoundError, BundleError) as e:
+        return dict(plan, reason=f'no usable bundle ({e})')
+    
+    columns = pd.read_csv(dataset_path, nrows=0).columns[1:].tolist()
+    if columns != header['symptom_names']:
+        added = sorted(set(columns) - set(header['symptom_names']))
+        removed = sorted(set(header['symptom_names']) - set(columns))
+        change = f"{len(added)} added, {len(removed)} removed" if added or removed else "columns reordered"
+        raise SystemExit(
+            f"Symptom columns changed since the bundle was trained ({change}); "
+            f"refusing to train incrementally. Run without --incremental for a full retrain."
+        )
+    
+    if header.get('training_data_hash') == data_hash:
+        return dict(plan, action='skip')
+    
+    old_rows = header.get('training_data_rows')
+    old_bytes = header.get('training_data_bytes')
+    if old_rows is None or old_bytes is None:
+        return dict(plan, reason='bundle does not record its training data size')
+    if header.get('training_dedup'):
+        return dict(plan, reason='bundle was trained on deduplicated rows')
+    if 'sklearn/model' not in header['arrays']:
+        return dict(plan, reason='bundle has no sklearn estimator to grow')
+    if 'split/test_rows' not in header['arrays']:
+        return dict(plan, reason='bundle does not record its held-out rows')
+    if plan['bytes'] <= old_bytes or file_sha256(dataset_path, old_bytes) != header['training_data_hash']:
+        return dict(plan, reason='dataset was modified, not appended to')
+    
+    return dict(plan, action='grow', rows=old_rows, model=load_sklearn_model(bundle_path, header),
+                test_rows=load_test_rows(bundle_path, header))
+
+def grow_model(model, diseases, symptoms, old_rows, old_test_rows, extra_estimators, profile=None):
+    """Add extra_estimators trees to model with warm_start
+    
+    The first old_rows rows keep the held-out set recorded in the bundle
+    (old_test_rows), so rows the existing trees never saw stay out of
+    training; the appended rows are split 80/20 on their own. The new trees
+    are fit on all training rows. Returns None, meaning a full retrain is
+    needed, when the training rows would not cover exactly the model's
+    classes: warm_start refits classes_ from y, and a changed class set
+    would misalign the old trees' probability columns. Otherwise returns
+    the model, the symptom names and the new held-out row indices.
+    profile receives the split, fit and evaluate stages.
+    """
+    print(f"Growing model with {extra_estimators} trees for {len(diseases) - old_rows} appended rows...")
+    profile = profile or TrainingProfile()
+    
+    unseen = set(diseases.iloc[old_rows:].unique()) - set(model.classes_)
+    if unseen:
+        print(f"Appended rows contain {len(unseen)} new diseases; falling back to a full retrain")
+        return None
+    
+    new_rows = np.arange(old_rows, len(diseases))
+    new_test_rows = new_rows[:0]
+    if len(new_rows) >= 5:
+        new_test_rows = np.sort(train_test_split(new_rows, test_size=0.2, random_state=42)[1])
+    test_rows = np.concatenate([old_test_rows, new_test_rows])
+    X_train, X_test, y_train, y_test = split_rows(test_rows, symptoms, diseases)
+    profile.mark('split')
+    
+    if set(y_train) != set(model.classes_):
+        print("Training rows do not cover exactly the model's classes; falling back to a full retrain")
+        return None
+    
+    print(f"Training set size: {len(X_train)}")
+    print(f"Test set size: {len(X_test)}")
+    
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + extra_estimators)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    model.set_params(warm_start=False)
+    print(f"Fit time: {time.perf_counter() - start:.2f}s ({len(model.estimators_)} trees in total)")
+    profile.mark('fit')
+    
+    accuracy = accuracy_score(y_test, model.predict(X_test))
+    print(f"Model accuracy: {accuracy:.3f}")
+    profile.mark('evaluate')
+    profile.note(holdout_accuracy=round(float(accuracy), 4), train_rows=len(X_train), test_rows=len(X_test))
+    
+    return model, symptoms.columns.tolist(), test_rows
+
+LINEAR_BACKENDS = ('bernoulli_nb', 'logistic')
+
+def previous_backends(bundle_path=BUNDLE_PATH):
+    """Lightweight backends in the existing bundle, so a retrain keeps serving them"""
+    try:
+        header = read_header(bundle_path)
+    except (FileNotFoundError, BundleError):
+        return []
+    return [name for name in header.get('backends', {}) if name in LINEAR_BACKENDS]
+
+def carry_backends(bundle_path=BUNDLE_PATH):
+    """The existing bundle's lightweight backends as {name: (metadata, arrays)}, unchanged
+    
+    Used when the forest is grown: its classes and symptom columns are the
+    same, so the old weights still line up and need not be refit.
+    """
+    header = read_header(bundle_path)
+    return {
+        name: (header['backends'][name], load_arrays(bundle_path, header, prefix=f'backends/{name}/'))
+        for name in previous_backends(bundle_path)
+    }
+
+def make_backend(name):
+    """Unfitted estimator for one of the lightweight backends"""
+    if name == 'bernoulli_nb':
+        return BernoulliNB()
+    if name == 'logistic':
+        return LogisticRegression(max_iter=300)
+    raise ValueError(f'Unknown backend {name!r}')
+
+def linear_backend_arrays(estimator):
+    """Fold a fitted BernoulliNB or LogisticRegression into (weights, bias)
+    
+    predict.LinearModel computes softmax(X @ weights + bias), which equals
+    the estimator's predict_proba for 0/1 features. For naive Bayes the
+    absent-symptom terms log(1 - p) are moved into the bias.
+    """
+    if isinstance(estimator, BernoulliNB):
+        log_present = estimator.feature_log_prob_
+        log_absent = np.log1p(-np.exp(log_present))
+        weights = (log_present - log_absent).T
+        bias = estimator.class_log_prior_ + log_absent.sum(axis=1)
+    else:
+        weights, bias = estimator.coef_.T, estimator.intercept_
+        if weights.shape[1] == 1:
+            # Binary logistic regression scores only the positive class
+            weights = np.hstack([np.zeros_like(weights), weights])
+            bias = np.concatenate([[0.0], bias])
+    return {'weights': weights.astype(np.float32), 'bias': bias.astype(np.float32)}
+
+def train_backends(names, diseases, symptoms, classes, test_rows, sample_weight=None):
+    """Train lightweight backends on the forest's split (test_rows held out)
+    
+    Returns {name: (metadata, arrays)} for the bundle. Every backend must
+    see the same classes as the forest so probability columns line up.
+    """
+    weighted = sample_weight is not None
+    if not weighted:
+        sample_weight = np.ones(len(diseases), dtype=np.int64)
+    X_train, X_test, y_train, y_test, w_train, w_test = split_rows(test_rows, symptoms, diseases, sample_weight)
+    
+    backends = {}
+    for name in names:
+        print(f"Training {name} backend...")
+        estimator = make_backend(name)
+        start = time.perf_counter()
+        estimator.fit(X_train, y_train, sample_weight=w_train if weighted else None)
+        fit_seconds = time.perf_counter() - start
+        if not np.array_equal(estimator.classes_, classes):
+            raise ValueError(f'{name} backend was fit on different classes than the forest')
+        
+        accuracy = accuracy_score(y_test, estimator.predict(X_test), sample_weight=w_test)
+        print(f"{name} accuracy: {accuracy:.3f} (fit {fit_seconds:.2f}s)")
+        metadata = {
+            'type': type(estimator).__name__,
+            'params': estimator.get_params(),
+            'accuracy': round(float(accuracy), 4),
+        }
+        arrays = linear_backend_arrays(estimator)
+        max_error = verify_linear_backend(arrays, estimator, X_test.iloc[:1000])
+        print(f"{name} matrix form matches sklearn (max abs error {max_error:.2e})")
+        backends[name] = (metadata, arrays)
+    return backends
+
+def verify_linear_backend(arrays, estimator, X, atol=1e-4):
+    """Check predict.LinearModel reproduces estimator.predict_proba on X (float32 weights)"""
+    from predict import LinearModel
+    
+    X = np.asarray(X, dtype=np.float32)
+    expected = estimator.predict_proba(X)
+    actual = LinearModel(arrays).predict_proba(X)
+    max_error = float(np.abs(expected - actual).max()) if len(X) else 0.0
+    if max_error > atol:
+        raise ValueError(f"Linear backend does not match sklearn (max abs error {max_error:.2e})")
+    return max_error
+
+def tree_arrays(tree):
+    """Node arrays of one fitted sklearn tree with per-node class distributions
+    
+    Leaves have left == right == -1. value holds the class distribution of
+    the training samples reaching each node, normalized to sum to 1.
+    """
+    values = tree.value[:, 0, :]
+    return {
+        'feature': tree.feature,
+        'threshold': tree.threshold,
+        'left': tree.children_left,
+        'right': tree.children_right,
+        'value': values / values.sum(axis=1, keepdims=True),
+        'max_depth': tree.max_depth,
+    }
+
+def assemble_forest(trees, n_features):
+    """Concatenate per-tree node arrays into the compiled forest format
+    
+    All trees are concatenated into one node table. Child pointers are global
+    node indices stored as interleaved (left, right) pairs, and leaves point at
+    themselves. Leaf class distributions are stored in a separate table.
+    """
+    features, thresholds, children, leaf_indices, leaf_values = [], [], [], [], []
+    roots = []
+    node_offset = 0
+    leaf_offset = 0
+    max_depth = 0
+    
+    for tree in trees:
+        is_leaf = tree['left'] == -1
+        node_count = len(is_leaf)
+        node_ids = np.arange(node_count)
+        
+        roots.append(node_offset)
+        features.append(np.where(is_leaf, 0, tree['feature']))
+        thresholds.append(np.where(is_leaf, 0.0, tree['threshold']))
+        children.append(np.stack([
+            np.where(is_leaf, node_ids, tree['left']),
+            np.where(is_leaf, node_ids, tree['right'])
+        ], axis=1) + node_offset)
+        
+        leaf_index = np.full(node_count, -1)
+        leaf_index[is_leaf] = np.arange(is_leaf.sum()) + leaf_offset
+        leaf_indices.append(leaf_index)
+        leaf_values.append(tree['value'][is_leaf])
+        
+        node_offset += node_count
+        leaf_offset += int(is_leaf.sum())
+        max_depth = max(max_depth, tree['max_depth'])
     
-    # Save the model
-    joblib.dump(model, 'trained_model.pkl')
+    return {
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'children': np.concatenate(children).astype(np.int32),
+        'leaf_index': np.concatenate(leaf_indices).astype(np.int32),
+        'leaf_values': np.concatenate(leaf_values).astype(np.float64),
+        'roots': np.array(roots, dtype=np.int32),
+        'max_depth': np.array(max_depth, dtype=np.int32),
+        'n_features': np.array(n_features, dtype=np.int32),
+    }
+
+def compile_forest(model):
+    """Flatten a fitted RandomForestClassifier into contiguous NumPy arrays
     
-    # Save symptom names
-    with open('symptom_names.json', 'w') as f:
-        json.dump(symptom_names, f)
+    Leaf distributions are normalized per leaf exactly like
+    DecisionTreeClassifier.predict_proba, so the compiled forest reproduces
+    model.predict_proba.
+    """
+    trees = [tree_arrays(estimator.tree_) for estimator in model.estimators_]
+    return assemble_forest(trees, model.n_features_in_)
+
+# Rows checked for compiled-forest parity when saving; the check holds several
+# dense (rows, classes) matrices at once, so it never runs on the full dataset
+VERIFY_ROWS = 2000
+
+def verification_sample(symptoms, rows=VERIFY_ROWS, seed=0):
+    """A fixed random sample of feature rows for verify_compiled_forest"""
+    if len(symptoms) <= rows:
+        return symptoms.to_numpy()
+    index = np.sort(np.random.default_rng(seed).choice(len(symptoms), size=rows, replace=False))
+    return symptoms.iloc[index].to_numpy()
+
+def verify_compiled_forest(compiled, model, X, atol=1e-9):
+    """Check the compiled forest reproduces model.predict_proba on X"""
+    from predict import CompiledForest
     
-    # Save unique diseases
-    unique_diseases = diseases.unique().tolist()
-    with open('diseases.json', 'w') as f:
-        json.dump(unique_diseases, f)
+    X = np.asarray(X, dtype=np.float32)
+    expected = model.predict_proba(X)
+    actual = CompiledForest(compiled).predict_proba(X)
+    max_error = float(np.abs(expected - actual).max()) if len(X) else 0.0
+    if max_error > atol:
+        raise ValueError(f"Compiled forest does not match sklearn (max abs error {max_error:.2e})")
+    return max_error
+
+_file_hashes = {}
+
+def file_sha256(path, length=None):
+    """SHA-256 of a file's contents (or its first length bytes), read in 1 MiB blocks
     
-    # Create a mapping of symptoms to their indices
-    symptom_mapping = {name: i for i, name in enumerate(symptom_names)}
-    with open('symptom_mapping.json', 'w') as f:
-        json.dump(symptom_mapping, f)
+    Results are memoised until the file's size or mtime changes, so the
+    dataset cache, incremental planning and the bundle header hash the CSV once.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), length)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    cached = _file_hashes.get(memo_key)
+    if cached and cached[0] == signature:
+        return cached[1]
+    
+    digest = hashlib.sha256()
+    remaining = os.path.getsize(path) if length is None else length
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            block = f.read(min(1 << 20, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    _file_hashes[memo_key] = (signature, digest.hexdigest())
+    return digest.hexdigest()
+
+def bundle_contents(model, symptom_names, training_data_hash=None, compiled=None, provenance=None,
+                    symptom_index=None, backends=None, test_rows=None):
+    """Build the (header, arrays) pair that make up a model bundle
+    
+    provenance holds extra header fields describing the training data, such
+    as the row count and byte size used by incremental retraining.
+    symptom_index is the (metadata, arrays) pair from build_symptom_index,
+    backends the result of train_backends and test_rows the held-out row
+    indices of the training data.
+    """
+    if compiled is None:
+        compiled = compile_forest(model)
+    
+    header = {
+        'training_data_hash': training_data_hash,
+        'sklearn_version': sklearn.__version__,
+        'n_features': len(symptom_names),
+        'n_classes': len(model.classes_),
+        'symptom_names': list(symptom_names),
+        'diseases': model.classes_.tolist(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'model': {'type': type(model).__name__, 'params': model.get_params()},
+    }
+    header.update(provenance or {})
+    arrays = {f'forest/{name}': array for name, array in compiled.items()}
+    arrays['sklearn/model'] = np.frombuffer(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL), dtype=np.uint8)
+    if test_rows is not None:
+        arrays['split/test_rows'] = np.asarray(test_rows, dtype=np.int64)
+    if symptom_index is not None:
+        header['symptom_index'], index_arrays = symptom_index
+        arrays.update({f'symptom_index/{name}': array for name, array in index_arrays.items()})
+    header['backends'] = {'forest': {'type': type(model).__name__}}
+    for backend, (metadata, backend_arrays) in (backends or {}).items():
+        header['backends'][backend] = metadata
+        arrays.update({f'backends/{backend}/{name}': array for name, array in backend_arrays.items()})
+    return header, arrays
+
+def save_model_and_data(model, symptom_names, diseases, verify_X=None, training_data_hash=None, path=BUNDLE_PATH,
+                        provenance=None, symptom_index=None, backends=None, test_rows=None):
+    """Save the trained model and metadata as a single model bundle
+    
+    The bundle holds the compiled forest arrays used by predict.py, the
+    pickled sklearn estimator for training tools, and a header with the
+    symptom names and the diseases in the model's class order so probability
+    columns line up. The symptom-to-index mapping is rebuilt by the loader.
+    """
+    print("Saving model and data...")
+    
+    # Compile the forest into the array form used by predict.py for fast inference
+    compiled = compile_forest(model)
+    if verify_X is not None:
+        max_error = verify_compiled_forest(compiled, model, verify_X)
+        print(f"Compiled forest matches sklearn (max abs error {max_error:.2e})")
+    
+    header, arrays = bundle_contents(model, symptom_names, training_data_hash, compiled=compiled,
+                                     provenance=provenance, symptom_index=symptom_index, backends=backends,
+                                     test_rows=test_rows)
+    write_bundle(path, header, arrays)
     
     print("Files saved:")
-    print("- trained_model.pkl (trained model)")
-    print("- symptom_names.json (list of all symptoms)")
-    print("- diseases.json (list of all diseases)")
-    print("- symptom_mapping.json (symptom name to index mapping)")
+    print(f"- {path} (model, symptom names and diseases in one versioned bundle)")
+
+DEFAULT_SWEEP_GRID = {
+    'n_estimators': [25, 50, 100],
+    'max_depth': [None, 30, 15],
+    'min_samples_leaf': [1, 3],
+    'max_features': ['sqrt', 0.1],
+}
+
+# Training split shared by every sweep worker, set once per process
+_sweep_data = None
+
+def _init_sweep_worker(data):
+    global _sweep_data
+    _sweep_data = data
+
+def _fit_sweep_candidate(params, bundle_path):
+    """Fit one configuration, score it on the held-out split and save its bundle"""
+    X_train, X_test, y_train, y_test, w_train, w_test, symptom_names, weighted = _sweep_data
+    
+    model = RandomForestClassifier(random_state=42, n_jobs=1, **params)
+    start = time.perf_counter()
+    model.fit(X_train, y_train, sample_weight=w_train if weighted else None)
+    fit_seconds = time.perf_counter() - start
+    
+    accuracy = accuracy_score(y_test, model.predict(X_test), sample_weight=w_test)
+    header, arrays = bundle_contents(model, symptom_names)
+    write_bundle(bundle_path, header, arrays)
+    
+    return {
+        'params': params,
+        'accuracy': round(float(accuracy), 4),
+        'fit_s': round(fit_seconds, 3),
+        'n_nodes': int(len(arrays['forest/feature'])),
+        'deepest_tree': int(arrays['forest/max_depth']),
+    }
+
+def measure_bundle_inference(bundle_path, n_features, rng, single_repeats=200, batch_rows=1000):
+    """Load time, single-row p50 and batch latency of a bundle as predict.py uses it
+    
+    The batch is timed after an untimed warm-up call, so a forest that
+    hands large batches to its sklearn estimator is measured without the
+    one-off unpickle.
+    """
+    from predict import load_model_and_data
+    
+    start = time.perf_counter()
+    model = load_model_and_data(path=bundle_path)[0]
+    load_seconds = time.perf_counter() - start
+    
+    X = (rng.random((batch_rows, n_features)) < 4 / n_features).astype(np.float32)
+    single = []
+    for row in range(single_repeats):
+        start = time.perf_counter()
+        model.predict_proba(X[row % batch_rows:row % batch_rows + 1])
+        single.append((time.perf_counter() - start) * 1000)
+    
+    model.predict_proba(X)
+    start = time.perf_counter()
+    model.predict_proba(X)
+    batch_ms = (time.perf_counter() - start) * 1000
+    
+    return {
+        'load_ms': round(load_seconds * 1000, 2),
+        'single_row_p50_ms': round(float(np.percentile(single, 50)), 4),
+        'batch_ms': round(batch_ms, 2),
+        'batch_rows': batch_rows,
+        'bundle_bytes': os.path.getsize(bundle_path),
+    }
+
+def pareto_front(results):
+    """Mark candidates no other candidate beats on accuracy, latency and size at once"""
+    def dominates(a, b):
+        no_worse = (a['accuracy'] >= b['accuracy'] and a['single_row_p50_ms'] <= b['single_row_p50_ms']
+                    and a['bundle_bytes'] <= b['bundle_bytes'])
+        better = (a['accuracy'] > b['accuracy'] or a['single_row_p50_ms'] < b['single_row_p50_ms']
+                  or a['bundle_bytes'] < b['bundle_bytes'])
+        return no_worse and better
+    
+    for candidate in results:
+        candidate['pareto'] = not any(dominates(other, candidate) for other in results if other is not candidate)
+    return [candidate for candidate in results if candidate['pareto']]
+
+def run_sweep(diseases, symptoms, sample_weight=None, grid=None, jobs=None, output='sweep_results.json'):
+    """Train every configuration in grid in parallel and report the trade-offs
+    
+    Fits run in a process pool, one single-threaded forest per process.
+    Inference latency and load time are then measured one candidate at a
+    time so parallel fits do not skew them. Results, with Pareto-optimal
+    candidates flagged, are written to output.
+    """
+    grid = grid or DEFAULT_SWEEP_GRID
+    keys = sorted(grid)
+    candidates = [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+    print(f"Sweeping {len(candidates)} configurations...")
+    
+    weighted = sample_weight is not None
+    if not weighted:
+        sample_weight = np.ones(len(diseases), dtype=np.int64)
+    X_train, X_test, y_train, y_test, w_train, w_test = train_test_split(
+        symptoms, diseases, sample_weight, test_size=0.2, random_state=42
+    )
+    data = (X_train, X_test, y_train, y_test, w_train, w_test, symptoms.columns.tolist(), weighted)
+    
+    results = []
+    with tempfile.TemporaryDirectory(prefix='sweep-') as workdir:
+        paths = [os.path.join(workdir, f'candidate_{i}.bin') for i in range(len(candidates))]
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_sweep_worker, initargs=(data,)) as pool:
+            fitted = list(pool.map(_fit_sweep_candidate, candidates, paths))
+        
+        rng = np.random.default_rng(0)
+        for result, path in zip(fitted, paths):
+            result.update(measure_bundle_inference(path, symptoms.shape[1], rng))
+            results.append(result)
+            print(f"- {result['params']}: accuracy {result['accuracy']:.3f}, "
+                  f"single row {result['single_row_p50_ms']:.3f} ms, "
+                  f"batch {result['batch_ms']:.1f} ms, {result['bundle_bytes'] / 2**20:.1f} MiB, "
+                  f"load {result['load_ms']:.0f} ms")
+    
+    front = pareto_front(results)
+    front.sort(key=lambda candidate: candidate['single_row_p50_ms'])
+    
+    with open(output, 'w') as f:
+        json.dump({'grid': grid, 'results': results, 'pareto_front': front}, f, indent=2, default=str)
+    
+    print(f"\nPareto front ({len(front)} of {len(results)} configurations):")
+    for candidate in front:
+        print(f"- {candidate['params']}: accuracy {candidate['accuracy']:.3f}, "
+              f"single row {candidate['single_row_p50_ms']:.3f} ms, {candidate['bundle_bytes'] / 2**20:.1f} MiB")
+    print(f"Sweep results saved to {output}")
+    return results
 
 def create_symptom_categories(symptom_names):
     """Create categorized symptoms for the frontend"""
@@ -134,21 +870,165 @@ def create_symptom_categories(symptom_names):
     print("Symptom categories saved to symptom_categories.json")
     return categories
 
+def build_symptom_index(model, diseases, symptoms, categories, sample_weight=None):
+    """Per-disease symptom frequencies and symptom categories for next-symptom suggestions
+    
+    Returns (metadata, arrays) for the bundle: frequency[d, s] is the share
+    of disease d's rows (in model class order) that show symptom s, prior[d]
+    is disease d's share of all rows, and category[s] indexes the category
+    names from create_symptom_categories.
+    """
+    codes = pd.Categorical(diseases, categories=model.classes_).codes
+    known = codes >= 0
+    weights = np.ones(len(codes)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+    
+    weighted = symptoms if sample_weight is None else symptoms.mul(weights, axis=0)
+    counts = weighted[known].groupby(codes[known]).sum().reindex(range(len(model.classes_)), fill_value=0)
+    totals = np.bincount(codes[known], weights=weights[known], minlength=len(model.classes_))
+    
+    category_names = list(categories)
+    category_of = {symptom: position for position, name in enumerate(category_names)
+                   for symptom in categories[name]}
+    
+    arrays = {
+        'frequency': (counts.to_numpy(dtype=np.float64) / np.maximum(totals, 1)[:, None]).astype(np.float32),
+        'prior': (totals / totals.sum()).astype(np.float32),
+        'category': np.array([category_of.get(symptom, category_names.index('General'))
+                              for symptom in symptoms.columns], dtype=np.uint8),
+    }
+    return {'categories': category_names}, arrays
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Train the disease prediction model')
+    parser.add_argument('--dataset', default=DATASET_PATH, help='training CSV')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='parse the CSV this many rows at a time to bound memory')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='always parse the CSV instead of using the binary dataset cache next to it')
+    parser.add_argument('--dedup', action='store_true',
+                        help='collapse identical rows and train/evaluate with their counts as sample weights')
+    parser.add_argument('--sweep', action='store_true',
+                        help='train a grid of forest configurations in parallel and report the Pareto front '
+                             'of accuracy, single-row latency and bundle size instead of training one model')
+    parser.add_argument('--sweep-grid', metavar='JSON',
+                        help='parameter grid as JSON, e.g. \'{"n_estimators": [50, 100], "max_depth": [null, 20]}\'')
+    parser.add_argument('--sweep-jobs', type=int, default=None, help='parallel fits (default: CPU count)')
+    parser.add_argument('--sweep-output', default='sweep_results.json')
+    parser.add_argument('--backends', default=None,
+                        help='comma-separated lightweight backends to train alongside the forest '
+                             '(bernoulli_nb, logistic), or "none"; predict.py picks one with --backend or '
+                             'PREDICT_BACKEND (default: the backends already in the bundle, retrained on a '
+                             'full run and kept as they are when --incremental grows the forest)')
+    parser.add_argument('--report', default=REPORT_PATH,
+                        help='JSON file receiving per-stage wall/CPU time, peak RSS, dataset shape and model size')
+    parser.add_argument('--incremental', action='store_true',
+                        help='skip training if the CSV is unchanged since the last run, and grow the existing '
+                             'forest with warm_start when rows were only appended')
+    parser.add_argument('--extra-estimators', type=int, default=10,
+                        help='trees to add per incremental run on appended rows')
+    args = parser.parse_args(argv)
+    if args.backends is not None:
+        args.backends = [name for name in args.backends.split(',') if name and name != 'none']
+        for name in args.backends:
+            if name not in LINEAR_BACKENDS:
+                parser.error(f'unknown backend {name!r}')
+    if args.incremental and (args.dedup or args.sweep):
+        parser.error('--incremental cannot be combined with --dedup or --sweep')
+    return args
+
 def main():
     """Main function to train the model"""
+    args = parse_args()
     print("=== Disease Symptoms Model Training ===")
+    profile = TrainingProfile()
+    
+    plan = {'action': 'full', 'hash': None}
+    if args.incremental:
+        plan = plan_incremental(args.dataset)
+        profile.mark('plan')
+        if plan['action'] == 'skip':
+            print(f"{args.dataset} is unchanged since {BUNDLE_PATH} was trained; nothing to do")
+            profile.note(mode='skip', dataset=args.dataset)
+            profile.write(args.report)
+            return
+        if plan['action'] == 'full':
+            print(f"Full retrain: {plan['reason']}")
     
     # Load and preprocess data
-    diseases, symptoms = load_and_preprocess_data()
+    diseases, symptoms = load_and_preprocess_data(args.dataset, chunksize=args.chunksize,
+                                                  cache=not args.no_cache)
+    total_rows = len(diseases)
+    profile.mark('load')
+    profile.note(dataset=args.dataset, dataset_bytes=os.path.getsize(args.dataset),
+                 dataset_shape={'rows': total_rows, 'symptoms': symptoms.shape[1],
+                                'diseases': len(diseases.cat.categories)})
     
-    # Train the model
-    model, symptom_names = train_model(diseases, symptoms)
+    # Optionally collapse exact duplicates into weighted unique rows
+    counts = None
+    if args.dedup:
+        start = time.perf_counter()
+        diseases, symptoms, counts = collapse_duplicates(diseases, symptoms)
+        print(f"Collapsed {total_rows} rows into {len(diseases)} unique rows "
+              f"({1 - len(diseases) / total_rows:.1%} fewer, {time.perf_counter() - start:.2f}s)")
+        profile.mark('dedup')
+        profile.note(unique_rows=len(diseases))
     
-    # Save model and data
-    save_model_and_data(model, symptom_names, diseases)
+    if args.sweep:
+        grid = json.loads(args.sweep_grid) if args.sweep_grid else None
+        results = run_sweep(diseases, symptoms, sample_weight=counts, grid=grid, jobs=args.sweep_jobs,
+                            output=args.sweep_output)
+        profile.mark('sweep')
+        profile.note(mode='sweep', sweep_output=args.sweep_output, sweep_candidates=len(results))
+        profile.write(args.report)
+        return
     
-    # Create symptom categories
+    # Train the model, or grow the existing one when rows were only appended
+    grown = None
+    if plan['action'] == 'grow':
+        grown = grow_model(plan['model'], diseases, symptoms, plan['rows'], plan['test_rows'],
+                           args.extra_estimators, profile=profile)
+    if grown:
+        model, symptom_names, test_rows = grown
+    else:
+        model, symptom_names, test_rows = train_model(diseases, symptoms, sample_weight=counts, profile=profile)
+    profile.note(mode='grow' if grown else 'full', n_estimators=len(model.estimators_))
+    
+    # Create symptom categories and the next-symptom index built from them
     categories = create_symptom_categories(symptom_names)
+    profile.mark('categorize')
+    symptom_index = build_symptom_index(model, diseases, symptoms, categories, sample_weight=counts)
+    profile.mark('symptom_index')
+    if args.backends is None and grown:
+        backends = carry_backends()
+        if backends:
+            print(f"Keeping backends from the existing bundle without refitting: {', '.join(backends)} "
+                  f"(--backends {','.join(backends)} refits them, --backends none drops them)")
+    else:
+        if args.backends is None:
+            args.backends = previous_backends()
+            if args.backends:
+                print(f"Retraining backends from the existing bundle: {', '.join(args.backends)} "
+                      f"(--backends none drops them)")
+        backends = train_backends(args.backends, diseases, symptoms, model.classes_, test_rows,
+                                  sample_weight=counts)
+    if backends:
+        profile.mark('backends')
+        profile.note(backends={name: metadata['accuracy'] for name, (metadata, _) in backends.items()})
+    
+    # Save model and data
+    provenance = {
+        'training_data_rows': total_rows,
+        'training_data_bytes': os.path.getsize(args.dataset),
+        'training_dedup': args.dedup,
+    }
+    save_model_and_data(model, symptom_names, diseases, verify_X=verification_sample(symptoms),
+                        training_data_hash=plan['hash'] or file_sha256(args.dataset), provenance=provenance,
+                        symptom_index=symptom_index, backends=backends,
+                        # Deduplicated row indices do not address CSV rows, so only record real ones
+                        test_rows=None if args.dedup else test_rows)
+    profile.mark('save')
+    profile.note(model_path=BUNDLE_PATH, model_bytes=os.path.getsize(BUNDLE_PATH))
     
     print("\n=== Training Complete ===")
     print("Model is ready to be integrated into the symptoms checker!")
@@ -157,7 +1037,21 @@ def main():
     print(f"\nStatistics:")
     print(f"- Total diseases: {len(diseases.unique())}")
     print(f"- Total symptoms: {len(symptom_names)}")
-    print(f"- Model accuracy: {accuracy_score(diseases, model.predict(symptoms)):.3f}")
+    
+    start = time.perf_counter()
+    accuracy = accuracy_score(diseases, model.predict(symptoms), sample_weight=counts)
+    evaluation_time = time.perf_counter() - start
+    print(f"- Model accuracy: {accuracy:.3f} (full dataset, {evaluation_time:.2f}s)")
+    if counts is not None:
+        # Prediction cost scales with rows, so this estimates the uncollapsed time
+        evaluation_saved = evaluation_time * (total_rows / len(diseases) - 1)
+        print(f"- Full-dataset evaluation on {len(diseases)} unique rows instead of {total_rows}: "
+              f"~{evaluation_saved:.2f}s saved")
+        profile.note(dedup_evaluation_saved_s=round(evaluation_saved, 3))
+    profile.mark('evaluate')
+    profile.note(full_dataset_accuracy=round(float(accuracy), 4))
+    
+    profile.write(args.report)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file